@@ -0,0 +1,102 @@
+import numpy as np
+from cube import MOVE_PERMS, MOVES, Cube, compile_moves, normalize_move
+
+
+_SOLVED = Cube().to_string().encode('ascii')
+
+_MOVE_INDEX = {m: i for i, m in enumerate(MOVES)}
+_IDENTITY = len(MOVES)
+
+# One row per move plus a trailing identity row, so a per-row gather can
+# leave some cubes untouched.
+_PERM_TABLE = np.array([MOVE_PERMS[m] for m in MOVES] + [list(range(54))], dtype=np.intp)
+
+_CENTER_INDICES = np.array([4, 13, 22, 31, 40, 49], dtype=np.intp)
+_FACE_LETTERS = np.frombuffer(b'URFDLB', dtype=np.uint8)
+
+
+def move_index(notation):
+    key = normalize_move(notation)
+    if not key:
+        return _IDENTITY
+    return _MOVE_INDEX[key]
+
+
+def move_names(indices):
+    names = MOVES + ['']
+    return [names[i] for i in np.asarray(indices).ravel()]
+
+
+class BatchCube:
+    def __init__(self, count):
+        solved = np.frombuffer(_SOLVED, dtype=np.uint8)
+        self.stickers = np.tile(solved, (count, 1))
+
+    @classmethod
+    def from_strings(cls, strings):
+        batch = cls(0)
+        data = b''.join(s.encode('ascii') for s in strings)
+        if len(data) % 54:
+            raise ValueError("Every cube string must have exactly 54 stickers.")
+        batch.stickers = np.frombuffer(data, dtype=np.uint8).reshape(-1, 54).copy()
+        return batch
+
+    @classmethod
+    def from_cubes(cls, cubes):
+        return cls.from_strings(c.to_string() for c in cubes)
+
+    def __len__(self):
+        return self.stickers.shape[0]
+
+    def copy(self):
+        batch = BatchCube(0)
+        batch.stickers = self.stickers.copy()
+        return batch
+
+    def apply_move(self, notation):
+        idx = move_index(notation)
+        if idx != _IDENTITY:
+            self.stickers = self.stickers[:, _PERM_TABLE[idx]]
+
+    def apply_moves(self, moves):
+        perm = compile_moves(moves)
+        if not perm.is_identity():
+            self.stickers = self.stickers[:, perm.perm]
+
+    def apply_row_moves(self, moves):
+        if isinstance(moves, np.ndarray) and moves.dtype.kind in 'iu':
+            indices = moves
+        else:
+            indices = np.array([move_index(m) for m in moves], dtype=np.intp)
+        if indices.shape != (len(self),):
+            raise ValueError(f"Expected one move per cube ({len(self)}), got {indices.shape[0]}.")
+        self.stickers = np.take_along_axis(self.stickers, _PERM_TABLE[indices], axis=1)
+
+    def scramble(self, length=20, rng=None):
+        rng = np.random.default_rng() if rng is None else rng
+        seq = rng.integers(0, len(MOVES), size=(len(self), length))
+        for step in range(length):
+            self.stickers = np.take_along_axis(self.stickers, _PERM_TABLE[seq[:, step]], axis=1)
+        return seq
+
+    def is_solved(self):
+        centers = self.stickers[:, _CENTER_INDICES]
+        return (self.stickers.reshape(-1, 6, 9) == centers[:, :, None]).all(axis=(1, 2))
+
+    def to_strings(self):
+        data = self.stickers.tobytes()
+        return [data[i:i + 54].decode('ascii') for i in range(0, len(data), 54)]
+
+    def to_facelet_array(self):
+        centers = self.stickers[:, _CENTER_INDICES]
+        matches = self.stickers[:, :, None] == centers[:, None, :]
+        found = matches.any(axis=2)
+        if not found.all():
+            row, pos = np.argwhere(~found)[0]
+            raise ValueError(f"Cube {row}: sticker color '{chr(self.stickers[row, pos])}' "
+                             f"not found among centers {centers[row].tobytes().decode('ascii')}")
+        return _FACE_LETTERS[matches.argmax(axis=2)]
+
+    def to_facelets(self):
+        data = self.to_facelet_array().tobytes()
+        return [data[i:i + 54].decode('ascii') for i in range(0, len(data), 54)]
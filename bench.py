@@ -0,0 +1,206 @@
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from cube import Cube
+from solver import KociembaSolver
+
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_baseline.json')
+SEED = 1234
+IMPORT_BUDGET_SECONDS = 0.25
+
+
+def _measure(func, number, repeat):
+    best = None
+    for _ in range(repeat):
+        began = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = (time.perf_counter() - began) / number
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def _scrambled_cube():
+    cube = Cube()
+    cube.scramble(25)
+    return cube
+
+
+def _run_python(code):
+    began = time.perf_counter()
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                         cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+    return time.perf_counter() - began, out.stdout.strip()
+
+
+def cube_benchmarks(scale):
+    results = {}
+    cube = _scrambled_cube()
+    for kind, move in (('cw', 'R'), ('prime', "R'"), ('double', 'R2')):
+        results[f'cube.execute_move[{kind}]'] = _measure(lambda: cube.execute_move(move), 2000 * scale, 5)
+    results['cube.scramble[20]'] = _measure(lambda: cube.scramble(20), 200 * scale, 5)
+    # Both are cached until the next change, so time them after a move.
+    results['cube.execute_move+is_solved'] = _measure(
+        lambda: (cube.execute_move('R'), cube.is_solved()), 2000 * scale, 5)
+    results['cube.execute_move+hash'] = _measure(lambda: (cube.execute_move('R'), hash(cube)), 2000 * scale, 5)
+    state = cube.get_state()
+    results['cube.get_state'] = _measure(cube.get_state, 200 * scale, 5)
+    results['cube.set_state'] = _measure(lambda: cube.set_state(state), 200 * scale, 5)
+    return results
+
+
+def solver_benchmarks(scale):
+    results = {}
+    solver = KociembaSolver()
+    cube = _scrambled_cube()
+
+    def build_and_validate():
+        solver._validate_facelet_string(solver._build_facelet_string(cube))
+
+    results['solver.build_facelets+validate'] = _measure(build_and_validate, 200 * scale, 5)
+    try:
+        import kociemba  # noqa: F401
+    except ImportError:
+        print("skipping solve benchmarks: kociemba is not installed", file=sys.stderr)
+        return results
+
+    facelets = solver._build_facelet_string(cube)
+    # Includes interpreter startup, so take the best of several fresh processes.
+    results['solver.solve[cold]'] = min(_run_python(
+        "from solver import KociembaSolver\n"
+        f"KociembaSolver().solve_facelets({facelets!r})\n"
+    )[0] for _ in range(5))
+    cubes = [_scrambled_cube() for _ in range(5 * scale)]
+    solver.solve(cubes[0])
+    results['solver.solve[warm]'] = _measure(lambda: [solver.solve(c) for c in cubes], 1, 3) / len(cubes)
+    return results
+
+
+def renderer_benchmarks(scale):
+    try:
+        from renderer import RubiksCube3D
+    except ImportError:
+        print("skipping renderer benchmarks: pyray is not installed", file=sys.stderr)
+        return {}
+    # Only the window-free parts of the renderer are measured.
+    app = RubiksCube3D.__new__(RubiksCube3D)
+    app.cube = _scrambled_cube()
+    app._facelet_colors_version = None
+    results = {}
+    results['renderer.generate_facelet_positions_map'] = _measure(app._generate_facelet_positions_map, 200 * scale, 5)
+    results['renderer.facelet_colors[cached]'] = _measure(app._current_facelet_colors, 2000 * scale, 5)
+    results['renderer.get_cubelets_in_layer'] = _measure(
+        lambda: [app._get_cubelets_in_layer(f) for f in 'URFDLB'], 200 * scale, 5) / 6
+    return results
+
+
+def nxn_benchmarks(scale):
+    try:
+        from nxn import NxNCube
+    except ImportError:
+        print("skipping NxN benchmarks: numpy is not installed", file=sys.stderr)
+        return {}
+    results = {}
+    for n in range(2, 8):
+        cube = NxNCube(n)
+        seq = cube.scramble(20)
+        results[f'nxn.execute_move[{n}x{n}]'] = _measure(lambda: cube.execute_move('R'), 2000 * scale, 5)
+        results[f'nxn.execute_moves[{n}x{n},20]'] = _measure(lambda: cube.execute_moves(seq), 2000 * scale, 5)
+    return results
+
+
+def import_benchmarks(runs=5):
+    best, heavy = None, ''
+    for _ in range(runs):
+        _, loaded = _run_python(
+            "import sys, time\n"
+            "t = time.perf_counter()\n"
+            "import cube, solver\n"
+            "print(time.perf_counter() - t, ','.join(m for m in ('pyray', 'raylib', 'kociemba') if m in sys.modules))\n"
+        )
+        import_seconds, heavy = loaded.split(' ') if ' ' in loaded else (loaded, '')
+        best = float(import_seconds) if best is None else min(best, float(import_seconds))
+    return {'import.cube+solver': best}, heavy
+
+
+BENCHMARKS = {
+    'cube': cube_benchmarks,
+    'solver': solver_benchmarks,
+    'renderer': renderer_benchmarks,
+    'nxn': nxn_benchmarks,
+}
+
+
+def run(groups, scale):
+    random.seed(SEED)
+    results = {}
+    for group in groups:
+        results.update(BENCHMARKS[group](scale))
+    return results
+
+
+def compare(results, baseline, max_regression):
+    failures = []
+    for name, seconds in sorted(results.items()):
+        base = baseline.get(name)
+        if base is None:
+            print(f"  {name:45s} {seconds * 1e6:12.2f} us   (no baseline)")
+            continue
+        change = (seconds - base) / base * 100.0
+        marker = ''
+        if change > max_regression:
+            marker = '  REGRESSION'
+            failures.append(name)
+        print(f"  {name:45s} {seconds * 1e6:12.2f} us   {change:+7.1f}%{marker}")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark cube, solver, NxN and render-prep hot paths.")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="JSON baseline file.")
+    parser.add_argument('--save', action='store_true', help="Write this run as the new baseline.")
+    parser.add_argument('--max-regression', type=float, default=20.0,
+                        help="Fail when a benchmark is slower than its baseline by more than this percent.")
+    parser.add_argument('--only', action='append', choices=sorted(BENCHMARKS), help="Run only these groups.")
+    parser.add_argument('--scale', type=int, default=1, help="Multiply iteration counts.")
+    args = parser.parse_args(argv)
+
+    results = run(args.only or list(BENCHMARKS), args.scale)
+    imports, heavy = import_benchmarks()
+    results.update(imports)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+    print(f"benchmarks (seed {SEED}, {platform.python_implementation()} {platform.python_version()}):")
+    failures = compare(results, baseline, args.max_regression)
+
+    status = 0
+    if heavy:
+        print(f"FAIL: importing cube and solver loaded {heavy}")
+        status = 1
+    if imports['import.cube+solver'] > IMPORT_BUDGET_SECONDS:
+        print(f"FAIL: importing cube and solver took {imports['import.cube+solver'] * 1000:.0f}ms "
+              f"(budget {IMPORT_BUDGET_SECONDS * 1000:.0f}ms)")
+        status = 1
+    if failures:
+        print(f"FAIL: {len(failures)} benchmark(s) regressed more than {args.max_regression:.0f}%")
+        status = 1
+
+    if args.save:
+        with open(args.baseline, 'w') as f:
+            json.dump({'seed': SEED, 'python': platform.python_version(), 'machine': platform.machine(),
+                       'results': results}, f, indent=2, sort_keys=True)
+        print(f"baseline written to {args.baseline}")
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,6 +1,263 @@
 import random
-from copy import deepcopy
-import pyray
+from array import array
+from collections import namedtuple
+from functools import lru_cache
+from math import lcm
+from operator import itemgetter
+
+
+MOVES = [f + s for f in 'URFDLB' for s in ('', '2', "'")]
+
+
+def normalize_move(notation):
+    if len(notation) == 0:
+        return ''
+    face = notation[0]
+    if face not in 'URFDLB':
+        raise ValueError(f"Unknown face in move: {notation}")
+    if notation.endswith("2"):
+        return face + '2'
+    if notation.endswith("'"):
+        return face + "'"
+    return face
+
+
+# Zobrist keys: one random 64-bit value per (sticker index, color byte). A
+# cube's hash is the XOR of the keys of its 54 stickers, so a sticker edit only
+# needs to XOR out the old key and XOR in the new one. Seeded so hashes agree
+# across processes.
+_zobrist_rng = random.Random(0x5EED)
+_ZOBRIST_KEYS = [[_zobrist_rng.getrandbits(64) for _ in range(256)] for _ in range(54)]
+del _zobrist_rng
+_CENTER_OF = tuple((i // 9) * 9 + 4 for i in range(54))
+
+
+def _zobrist(state):
+    h = 0
+    for keys, c in zip(_ZOBRIST_KEYS, state):
+        h ^= keys[c]
+    return h
+
+
+def _count_mismatches(s):
+    # Stickers that differ from their face's center.
+    return (54 - s.count(s[4], 0, 9) - s.count(s[13], 9, 18) - s.count(s[22], 18, 27)
+            - s.count(s[31], 27, 36) - s.count(s[40], 36, 45) - s.count(s[49], 45, 54))
+
+
+def compose_perms(first, second):
+    # Applying `first` then `second` is the same as applying the result once.
+    return [first[i] for i in second]
+
+
+class MovePermutation:
+    __slots__ = ('perm', '_getter')
+
+    def __init__(self, perm):
+        self.perm = tuple(perm)
+        self._getter = itemgetter(*self.perm)
+
+    def __eq__(self, other):
+        return isinstance(other, MovePermutation) and self.perm == other.perm
+
+    def __hash__(self):
+        return hash(self.perm)
+
+    def __repr__(self):
+        return f"MovePermutation(order={self.order()}, moved={self.moved_count()})"
+
+    def apply(self, stickers):
+        return self._getter(stickers)
+
+    def then(self, other):
+        return MovePermutation(compose_perms(self.perm, other.perm))
+
+    def inverse(self):
+        inv = [0] * len(self.perm)
+        for i, p in enumerate(self.perm):
+            inv[p] = i
+        return MovePermutation(inv)
+
+    def is_identity(self):
+        return all(i == p for i, p in enumerate(self.perm))
+
+    def moved_count(self):
+        return sum(1 for i, p in enumerate(self.perm) if i != p)
+
+    def cycles(self):
+        seen = [False] * len(self.perm)
+        cycles = []
+        for start in range(len(self.perm)):
+            if seen[start] or self.perm[start] == start:
+                continue
+            cycle = []
+            i = start
+            while not seen[i]:
+                seen[i] = True
+                cycle.append(i)
+                i = self.perm[i]
+            cycles.append(tuple(cycle))
+        return cycles
+
+    def order(self):
+        return lcm(1, *(len(c) for c in self.cycles()))
+
+
+# Old sticker of each new sticker when a face turns clockwise: first the face
+# itself (local indices), then the four strips around it, each taking the
+# stickers of the strip before it.
+_FACE_TURN_LOCAL = {0: 6, 1: 3, 2: 0, 3: 7, 4: 4, 5: 1, 6: 8, 7: 5, 8: 2}
+_ADJACENT_STRIPS = {
+    'U': [(45, 46, 47), (9, 10, 11), (18, 19, 20), (36, 37, 38)],
+    'D': [(24, 25, 26), (15, 16, 17), (51, 52, 53), (42, 43, 44)],
+    'F': [(6, 7, 8), (9, 12, 15), (29, 28, 27), (44, 41, 38)],
+    'B': [(2, 1, 0), (36, 39, 42), (33, 34, 35), (17, 14, 11)],
+    'L': [(0, 3, 6), (18, 21, 24), (27, 30, 33), (53, 50, 47)],
+    'R': [(8, 5, 2), (45, 48, 51), (35, 32, 29), (26, 23, 20)]
+}
+
+
+def _face_turn_perm(face):
+    perm = list(range(54))
+    base = 'URFDLB'.index(face) * 9
+    for new_local, old_local in _FACE_TURN_LOCAL.items():
+        perm[base + new_local] = base + old_local
+    strips = _ADJACENT_STRIPS[face]
+    for i in range(4):
+        new_strip, old_strip = strips[i], strips[(i - 1) % 4]
+        for j in range(3):
+            perm[new_strip[j]] = old_strip[j]
+    return perm
+
+
+def _build_move_perms():
+    perms = {}
+    for face in 'URFDLB':
+        cw = _face_turn_perm(face)
+        double = compose_perms(cw, cw)
+        perms[face] = cw
+        perms[face + '2'] = double
+        perms[face + "'"] = compose_perms(double, cw)
+    return perms
+
+
+# Sticker permutation of every move in MOVES (new[i] = old[perm[i]]).
+MOVE_PERMS = _build_move_perms()
+_MOVE_GETTERS = {m: itemgetter(*p) for m, p in MOVE_PERMS.items()}
+
+
+def split_moves(moves):
+    if isinstance(moves, str):
+        moves = moves.split()
+    return tuple(k for k in (normalize_move(m) for m in moves) if k)
+
+
+_AXIS = {'U': 0, 'D': 0, 'R': 1, 'L': 1, 'F': 2, 'B': 2}
+_QUARTER_TURNS = {'': 1, '2': 2, "'": 3}
+_TURN_SUFFIX = {1: '', 2: '2', 3: "'"}
+
+
+def simplify_moves(moves):
+    # Merges turns of the same face, drops ones that cancel out and writes
+    # turns of opposite faces (which commute) in URFDLB order, e.g. "D U" -> "U D".
+    groups = []
+    for key in split_moves(moves):
+        face, turns = key[0], _QUARTER_TURNS[key[1:]]
+        if groups and groups[-1][0] == _AXIS[face]:
+            counts = groups[-1][1]
+            counts[face] = (counts.get(face, 0) + turns) % 4
+            if not any(counts.values()):
+                groups.pop()
+        else:
+            groups.append((_AXIS[face], {face: turns}))
+
+    result = []
+    for _, counts in groups:
+        for face in 'URFDLB':
+            if counts.get(face):
+                result.append(face + _TURN_SUFFIX[counts[face]])
+    return result
+
+
+def invert_moves(moves):
+    # The sequence that undoes `moves`: reversed, with every turn direction flipped.
+    return [key[0] + _TURN_SUFFIX[4 - _QUARTER_TURNS[key[1:]]] for key in reversed(split_moves(moves))]
+
+
+@lru_cache(maxsize=4096)
+def _compile_normalized(keys):
+    perm = list(range(54))
+    for key in keys:
+        perm = compose_perms(perm, MOVE_PERMS[key])
+    return MovePermutation(perm)
+
+
+def compile_moves(moves):
+    return _compile_normalized(split_moves(moves))
+
+
+# An immutable copy of a cube's stickers (54 bytes) and its Zobrist hash.
+# Snapshots of an unchanged cube are the same object.
+CubeSnapshot = namedtuple('CubeSnapshot', ['stickers', 'hash'])
+
+
+class _FaceRow(list):
+    # One row of the materialized `Cube.faces` view. Reads are plain list reads;
+    # writes also land in the cube's stickers while the view is current. A row
+    # kept across a move or reset is a detached copy, as with the old nested lists.
+    __slots__ = ('_view', '_base')
+
+    def __init__(self, view, base, stickers):
+        list.__init__(self, stickers)
+        self._view = view
+        self._base = base
+
+    def __setitem__(self, col, color):
+        cols = range(len(self))[col]
+        if isinstance(col, slice):
+            colors = list(color)
+            if len(colors) != len(cols):
+                raise ValueError(f"Cannot assign {len(colors)} stickers to {len(cols)} in a face row.")
+        else:
+            cols, colors = (cols,), (color,)
+        for c, color in zip(cols, colors):
+            list.__setitem__(self, c, color)
+            self._view._write(self._base + c, color)
+
+    def __reduce__(self):
+        return list, (list(self),)
+
+    def __deepcopy__(self, memo):
+        return list(self)
+
+
+class _FaceView(dict):
+    # `Cube.faces`: face -> rows of _FaceRow. Assigning a face writes its 3x3
+    # colors through to the cube.
+    __slots__ = ('_cube',)
+
+    def __init__(self, cube):
+        dict.__init__(self)
+        self._cube = cube
+
+    def __setitem__(self, face, rows):
+        if face not in self:
+            raise KeyError(face)
+        rows = [list(row) for row in rows]
+        if len(rows) != 3:
+            raise ValueError(f"Face {face} needs 3 rows, got {len(rows)}.")
+        for target, row in zip(dict.__getitem__(self, face), rows):
+            target[:] = row
+
+    def _write(self, idx, color):
+        if self._cube._faces_view is self:
+            self._cube._set_sticker_index(idx, color)
+
+    def __reduce__(self):
+        return dict, ({f: [list(r) for r in rows] for f, rows in self.items()},)
+
+    def __deepcopy__(self, memo):
+        return {f: [list(r) for r in rows] for f, rows in self.items()}
 
 
 class Cube:
@@ -10,66 +267,111 @@ class Cube:
             'F': [['G'] * 3 for _ in range(3)], 'B': [['B'] * 3 for _ in range(3)],
             'L': [['O'] * 3 for _ in range(3)], 'R': [['R'] * 3 for _ in range(3)]
         }
-        self.faces = deepcopy(self._initial_state)
-        self._gui_color_map = {
-            'W': pyray.WHITE, 'Y': pyray.YELLOW, 'G': pyray.GREEN,
-            'B': pyray.BLUE, 'O': pyray.ORANGE, 'R': pyray.RED
-        }
         self._faces_order = ['U', 'R', 'F', 'D', 'L', 'B']
         self._face_offset = {f: i * 9 for i, f in enumerate(self._faces_order)}
-        self._face_rc_to_index = {}
-        self._index_to_face_rc = {}
 
-        for face in self._faces_order:
-            base = self._face_offset[face]
-            for r in range(3):
-                for c in range(3):
-                    idx = base + r * 3 + c
-                    self._face_rc_to_index[(face, r, c)] = idx
-                    self._index_to_face_rc[idx] = (face, r, c)
+        self._solved_state = self._flatten_faces(self._initial_state)
+        self._state = bytearray(self._solved_state)
+        self._faces_view = None
+        # Bumped on every state change so views and renderers can cache by it.
+        self.version = 0
+        self._snapshot = None
+        # The hash and mismatch count are computed when asked for and kept
+        # until the next change, so moves stay a single gather.
+        self._hash = self._hash_version = None
+        self._mismatches = self._mismatches_version = None
+
+    def __getstate__(self):
+        # Copies and pickles leave out the faces view (its rows write into
+        # this cube) and the cached snapshot, hash and mismatch count.
+        state = self.__dict__.copy()
+        state['_faces_view'] = state['_snapshot'] = None
+        state['_hash'] = state['_hash_version'] = None
+        state['_mismatches'] = state['_mismatches_version'] = None
+        return state
+
+    @property
+    def faces(self):
+        if self._faces_view is None:
+            self._faces_view = self._materialize_faces()
+        return self._faces_view
 
-        self._perm_cw = {f: self._build_perm_for_face(f) for f in self._faces_order}
+    @faces.setter
+    def faces(self, state):
+        self._state[:] = self._flatten_faces(state)
+        self._faces_view = None
+        self.version += 1
+
+    @classmethod
+    def from_string(cls, stickers):
+        if len(stickers) != 54:
+            raise ValueError(f"Sticker string wrong length: {len(stickers)} (expected 54).")
+        cube = cls()
+        cube._state[:] = stickers.encode('ascii')
+        return cube
 
     def get_state(self):
-        return deepcopy(self.faces)
+        # Fresh nested lists built straight from the sticker bytes.
+        s = self._state
+        return {
+            face: [[chr(s[i]) for i in range(base + r * 3, base + r * 3 + 3)] for r in range(3)]
+            for face, base in ((f, self._face_offset[f]) for f in self._initial_state)
+        }
 
     def set_state(self, state):
-        self.faces = deepcopy(state)
+        self.faces = state
+
+    def snapshot(self):
+        if self._snapshot is None or self._snapshot[0] != self.version:
+            self._snapshot = (self.version, CubeSnapshot(bytes(self._state), self._zobrist_hash()))
+        return self._snapshot[1]
+
+    def restore(self, snapshot):
+        self._state[:] = snapshot.stickers
+        self._faces_view = None
+        self.version += 1
+        self._hash, self._hash_version = snapshot.hash, self.version
 
     def reset(self):
-        self.faces = deepcopy(self._initial_state)
+        self._state[:] = self._solved_state
+        self._faces_view = None
+        self.version += 1
 
     def is_solved(self):
-        for f in self.faces:
-            color = self.faces[f][1][1]
-            for row in self.faces[f]:
-                for s in row:
-                    if s != color:
-                        return False
-        return True
+        if self._mismatches_version != self.version:
+            self._mismatches = _count_mismatches(self._state)
+            self._mismatches_version = self.version
+        return self._mismatches == 0
+
+    def __hash__(self):
+        # Mutable, like the state it hashes: don't change a cube while it is
+        # a dict key or in a set.
+        return self._zobrist_hash()
+
+    def __eq__(self, other):
+        if not isinstance(other, Cube):
+            return NotImplemented
+        return self._state == other._state
 
     def to_string(self):
-        s = []
-        for f in self._faces_order:
-            for row in self.faces[f]:
-                s.extend(row)
-        return ''.join(s)
+        return self._state.decode('ascii')
 
     def execute_move(self, notation):
-        if len(notation) == 0:
-            return
-        face = notation[0]
-        if face not in self._perm_cw:
-            raise ValueError(f"Unknown face in move: {notation}")
-
-        if notation.endswith("2"):
-            self._apply_perm(self._perm_cw[face])
-            self._apply_perm(self._perm_cw[face])
-        elif notation.endswith("'"):
-            for _ in range(3):
-                self._apply_perm(self._perm_cw[face])
-        else:
-            self._apply_perm(self._perm_cw[face])
+        getter = _MOVE_GETTERS.get(notation)
+        if getter is None:
+            key = normalize_move(notation)
+            if not key:
+                return
+            getter = _MOVE_GETTERS[key]
+
+        self._state[:] = getter(self._state)
+        self._faces_view = None
+        self.version += 1
+
+    def execute_moves(self, moves):
+        self._state[:] = compile_moves(moves).apply(self._state)
+        self._faces_view = None
+        self.version += 1
 
     def scramble(self, length=20):
         all_moves = [
@@ -77,43 +379,350 @@ class Cube:
             'U', "U'", 'U2', 'D', "D'", 'D2',
             'L', "L'", 'L2', 'R', "R'", 'R2'
         ]
-        seq = [random.choice(all_moves) for _ in range(length)]
-        for m in seq:
-            self.execute_move(m)
+        # Draws that would merge with or cancel the previous turns are
+        # redrawn, and opposite faces are kept in URFDLB order, so `seq` is
+        # already in simplify_moves form without re-simplifying it.
+        seq = []
+        while len(seq) < length:
+            move = random.choice(all_moves)
+            if seq:
+                face, last = move[0], seq[-1][0]
+                if face == last:
+                    continue
+                if _AXIS[face] == _AXIS[last]:
+                    if len(seq) > 1 and _AXIS[seq[-2][0]] == _AXIS[face]:
+                        continue
+                    if 'URFDLB'.index(face) < 'URFDLB'.index(last):
+                        seq.insert(-1, move)
+                        continue
+            seq.append(move)
+        self.execute_moves(seq)
         return seq
 
-    def _build_perm_for_face(self, face):
-        perm = list(range(54))
-        base = self._face_offset[face]
-        local_map = {0: 6, 1: 3, 2: 0, 3: 7, 4: 4, 5: 1, 6: 8, 7: 5, 8: 2}
-
-        for new_local, old_local in local_map.items():
-            perm[base + new_local] = base + old_local
-
-        adj = {
-            'U': [(45, 46, 47), (9, 10, 11), (18, 19, 20), (36, 37, 38)],
-            'D': [(24, 25, 26), (15, 16, 17), (51, 52, 53), (42, 43, 44)],
-            'F': [(6, 7, 8), (9, 12, 15), (29, 28, 27), (44, 41, 38)],
-            'B': [(2, 1, 0), (36, 39, 42), (33, 34, 35), (17, 14, 11)],
-            'L': [(0, 3, 6), (18, 21, 24), (27, 30, 33), (53, 50, 47)],
-            'R': [(8, 5, 2), (45, 48, 51), (35, 32, 29), (26, 23, 20)]
+    def _zobrist_hash(self):
+        # The full 64-bit hash; hash() folds it into Python's hash range.
+        if self._hash_version != self.version:
+            self._hash = _zobrist(self._state)
+            self._hash_version = self.version
+        return self._hash
+
+    def _set_sticker_index(self, idx, color):
+        s = self._state
+        old, new = s[idx], ord(color)
+        s[idx] = new
+        version = self.version
+        self.version += 1
+        # Edits keep an up-to-date hash and mismatch count current in O(1).
+        if self._hash_version == version:
+            self._hash ^= _ZOBRIST_KEYS[idx][old] ^ _ZOBRIST_KEYS[idx][new]
+            self._hash_version = self.version
+        if self._mismatches_version == version and _CENTER_OF[idx] != idx:
+            # A new center changes what the whole face should match, so
+            # center edits leave the count to be recomputed.
+            target = s[_CENTER_OF[idx]]
+            self._mismatches += (new != target) - (old != target)
+            self._mismatches_version = self.version
+
+    def _flatten_faces(self, state):
+        flat = bytearray(54)
+        for face in self._faces_order:
+            base = self._face_offset[face]
+            for r in range(3):
+                for c in range(3):
+                    flat[base + r * 3 + c] = ord(state[face][r][c])
+        return bytes(flat)
+
+    def _materialize_faces(self):
+        s = self._state
+        faces = _FaceView(self)
+        for face in self._initial_state:
+            base = self._face_offset[face]
+            dict.__setitem__(faces, face, [
+                _FaceRow(faces, base + r * 3, [chr(s[i]) for i in range(base + r * 3, base + r * 3 + 3)])
+                for r in range(3)
+            ])
+        return faces
+
+
+# Facelet indices of each corner and edge slot, in the URFDLB layout used by
+# Cube.to_string and the Kociemba facelet string. The first facelet of every
+# corner is its U/D sticker, the first facelet of every edge is its U/D (or
+# F/B for middle-layer edges) sticker.
+CORNER_FACELETS = (
+    (8, 9, 20), (6, 18, 38), (0, 36, 47), (2, 45, 11),
+    (29, 26, 15), (27, 44, 24), (33, 53, 42), (35, 17, 51)
+)
+EDGE_FACELETS = (
+    (5, 10), (7, 19), (3, 37), (1, 46), (32, 16), (28, 25),
+    (30, 43), (34, 52), (23, 12), (21, 41), (50, 39), (48, 14)
+)
+CORNER_NAMES = ('URF', 'UFL', 'ULB', 'UBR', 'DFR', 'DLF', 'DBL', 'DRB')
+EDGE_NAMES = ('UR', 'UF', 'UL', 'UB', 'DR', 'DF', 'DL', 'DB', 'FR', 'FL', 'BL', 'BR')
+
+# Colors of a corner/edge slot read in its facelet order -> (cubie, orientation).
+CORNER_LOOKUP = {}
+for _j, _name in enumerate(CORNER_NAMES):
+    for _o in range(3):
+        _key = [''] * 3
+        for _n in range(3):
+            _key[(_n + _o) % 3] = _name[_n]
+        CORNER_LOOKUP[''.join(_key)] = (_j, _o)
+EDGE_LOOKUP = {}
+for _j, _name in enumerate(EDGE_NAMES):
+    EDGE_LOOKUP[_name] = (_j, 0)
+    EDGE_LOOKUP[_name[::-1]] = (_j, 1)
+
+_SOLVED_FACELETS = ''.join(f * 9 for f in 'URFDLB')
+
+N_TWIST = 2187
+N_FLIP = 2048
+N_SLICE = 495
+N_CORNER_PERM = 40320
+N_EDGE_PERM = 479001600
+
+
+def _binomial(n, k):
+    if k < 0 or k > n:
+        return 0
+    result = 1
+    for i in range(k):
+        result = result * (n - i) // (i + 1)
+    return result
+
+
+def rank_perm(perm):
+    n = len(perm)
+    rank = 0
+    for i in range(n):
+        smaller = 0
+        for j in range(i + 1, n):
+            if perm[j] < perm[i]:
+                smaller += 1
+        rank = rank * (n - i) + smaller
+    return rank
+
+
+def unrank_perm(rank, n):
+    digits = [0] * n
+    for i in range(n - 1, -1, -1):
+        digits[i] = rank % (n - i)
+        rank //= n - i
+    pool = list(range(n))
+    return [pool.pop(d) for d in digits]
+
+
+def perm_parity(perm):
+    inversions = 0
+    for i in range(len(perm)):
+        for j in range(i + 1, len(perm)):
+            if perm[j] < perm[i]:
+                inversions += 1
+    return inversions & 1
+
+
+class CubieCube:
+    __slots__ = ('cp', 'co', 'ep', 'eo')
+
+    def __init__(self, cp=None, co=None, ep=None, eo=None):
+        self.cp = list(range(8)) if cp is None else list(cp)
+        self.co = [0] * 8 if co is None else list(co)
+        self.ep = list(range(12)) if ep is None else list(ep)
+        self.eo = [0] * 12 if eo is None else list(eo)
+
+    def __eq__(self, other):
+        return (isinstance(other, CubieCube) and self.cp == other.cp and self.co == other.co
+                and self.ep == other.ep and self.eo == other.eo)
+
+    def __hash__(self):
+        return hash((tuple(self.cp), tuple(self.co), tuple(self.ep), tuple(self.eo)))
+
+    def __repr__(self):
+        return f"CubieCube(cp={self.cp}, co={self.co}, ep={self.ep}, eo={self.eo})"
+
+    def copy(self):
+        return CubieCube(self.cp, self.co, self.ep, self.eo)
+
+    @classmethod
+    def from_facelets(cls, facelets):
+        if len(facelets) != 54:
+            raise ValueError(f"Facelet string wrong length: {len(facelets)} (expected 54).")
+        cube = cls.__new__(cls)
+        cube.cp = [0] * 8
+        cube.co = [0] * 8
+        cube.ep = [0] * 12
+        cube.eo = [0] * 12
+        for i, (a, b, c) in enumerate(CORNER_FACELETS):
+            found = CORNER_LOOKUP.get(facelets[a] + facelets[b] + facelets[c])
+            if found is None:
+                raise ValueError(f"Corner {CORNER_NAMES[i]} has invalid colors "
+                                 f"{facelets[a] + facelets[b] + facelets[c]}")
+            cube.cp[i], cube.co[i] = found
+        for i, (a, b) in enumerate(EDGE_FACELETS):
+            found = EDGE_LOOKUP.get(facelets[a] + facelets[b])
+            if found is None:
+                raise ValueError(f"Edge {EDGE_NAMES[i]} has invalid colors {facelets[a] + facelets[b]}")
+            cube.ep[i], cube.eo[i] = found
+        return cube
+
+    @classmethod
+    def from_cube(cls, cube):
+        stickers = cube.to_string()
+        color_to_face = {stickers[9 * i + 4]: f for i, f in enumerate('URFDLB')}
+        if len(color_to_face) != 6:
+            raise ValueError(f"Centers are not six distinct colors: {stickers[4::9]}")
+        try:
+            return cls.from_facelets(''.join([color_to_face[s] for s in stickers]))
+        except KeyError as e:
+            raise ValueError(f"Sticker color {e} not found among centers {stickers[4::9]}")
+
+    def to_facelets(self):
+        f = list(_SOLVED_FACELETS)
+        for i, slots in enumerate(CORNER_FACELETS):
+            name, o = CORNER_NAMES[self.cp[i]], self.co[i]
+            for n in range(3):
+                f[slots[(n + o) % 3]] = name[n]
+        for i, slots in enumerate(EDGE_FACELETS):
+            name, o = EDGE_NAMES[self.ep[i]], self.eo[i]
+            f[slots[o]] = name[0]
+            f[slots[1 - o]] = name[1]
+        return ''.join(f)
+
+    def multiply(self, other):
+        cp, co, ep, eo = self.cp, self.co, self.ep, self.eo
+        self.cp = [cp[p] for p in other.cp]
+        self.co = [(co[p] + o) % 3 for p, o in zip(other.cp, other.co)]
+        self.ep = [ep[p] for p in other.ep]
+        self.eo = [eo[p] ^ o for p, o in zip(other.ep, other.eo)]
+        return self
+
+    def __mul__(self, other):
+        return self.copy().multiply(other)
+
+    def inverse(self):
+        inv = CubieCube()
+        for i, p in enumerate(self.cp):
+            inv.cp[p] = i
+        for i, p in enumerate(self.ep):
+            inv.ep[p] = i
+        inv.co = [(3 - self.co[p]) % 3 for p in inv.cp]
+        inv.eo = [self.eo[p] for p in inv.ep]
+        return inv
+
+    def execute_move(self, notation):
+        key = normalize_move(notation)
+        if key:
+            self.multiply(cubie_moves()[key])
+
+    def execute_moves(self, moves):
+        for key in split_moves(moves):
+            self.multiply(cubie_moves()[key])
+
+    def corner_parity(self):
+        return perm_parity(self.cp)
+
+    def edge_parity(self):
+        return perm_parity(self.ep)
+
+    def is_solvable(self):
+        return (sorted(self.cp) == list(range(8)) and sorted(self.ep) == list(range(12))
+                and sum(self.co) % 3 == 0 and sum(self.eo) % 2 == 0
+                and self.corner_parity() == self.edge_parity())
+
+    def get_twist(self):
+        twist = 0
+        for o in self.co[:7]:
+            twist = twist * 3 + o
+        return twist
+
+    def set_twist(self, twist):
+        total = 0
+        for i in range(6, -1, -1):
+            self.co[i] = twist % 3
+            total += self.co[i]
+            twist //= 3
+        self.co[7] = (3 - total % 3) % 3
+
+    def get_flip(self):
+        flip = 0
+        for o in self.eo[:11]:
+            flip = flip * 2 + o
+        return flip
+
+    def set_flip(self, flip):
+        total = 0
+        for i in range(10, -1, -1):
+            self.eo[i] = flip & 1
+            total += self.eo[i]
+            flip >>= 1
+        self.eo[11] = total & 1
+
+    def get_slice(self):
+        # Positions of the four middle-layer edges (FR, FL, BL, BR), ignoring their order.
+        idx, seen = 0, 0
+        for j in range(11, -1, -1):
+            if self.ep[j] >= 8:
+                idx += _binomial(11 - j, seen + 1)
+                seen += 1
+        return idx
+
+    def set_slice(self, idx):
+        slice_edges = [8, 9, 10, 11]
+        other_edges = [0, 1, 2, 3, 4, 5, 6, 7]
+        self.ep = [-1] * 12
+        seen = 4
+        for j in range(12):
+            if seen > 0 and idx >= _binomial(11 - j, seen):
+                idx -= _binomial(11 - j, seen)
+                self.ep[j] = slice_edges[4 - seen]
+                seen -= 1
+        for j in range(12):
+            if self.ep[j] == -1:
+                self.ep[j] = other_edges.pop(0)
+
+    def get_corner_perm(self):
+        return rank_perm(self.cp)
+
+    def set_corner_perm(self, rank):
+        self.cp = unrank_perm(rank, 8)
+
+    def get_edge_perm(self):
+        return rank_perm(self.ep)
+
+    def set_edge_perm(self, rank):
+        self.ep = unrank_perm(rank, 12)
+
+
+def cubie_moves():
+    global _cubie_moves
+    if _cubie_moves is None:
+        solved = _SOLVED_FACELETS
+        _cubie_moves = {
+            key: CubieCube.from_facelets(''.join([solved[i] for i in MOVE_PERMS[key]]))
+            for key in MOVES
         }
+    return _cubie_moves
 
-        strips = adj[face]
-        for i in range(4):
-            new_strip, old_strip = strips[i], strips[(i - 1) % 4]
-            for j in range(3):
-                perm[new_strip[j]] = old_strip[j]
 
-        return perm
+_cubie_moves = None
+
+_COORDINATES = {
+    'twist': (N_TWIST, CubieCube.get_twist, CubieCube.set_twist),
+    'flip': (N_FLIP, CubieCube.get_flip, CubieCube.set_flip),
+    'slice': (N_SLICE, CubieCube.get_slice, CubieCube.set_slice),
+    'corner_perm': (N_CORNER_PERM, CubieCube.get_corner_perm, CubieCube.set_corner_perm),
+}
 
-    def _apply_perm(self, perm):
-        flat = [
-            self.faces[self._index_to_face_rc[i][0]][self._index_to_face_rc[i][1]][self._index_to_face_rc[i][2]]
-            for i in range(54)
-        ]
-        new_flat = [flat[perm[i]] for i in range(54)]
 
-        for i in range(54):
-            face, r, c = self._index_to_face_rc[i]
-            self.faces[face][r][c] = new_flat[i]
+@lru_cache(maxsize=None)
+def coordinate_move_table(name):
+    # Flat table indexed by coord * len(MOVES) + MOVES.index(move).
+    size, getter, setter = _COORDINATES[name]
+    moves = [cubie_moves()[key] for key in MOVES]
+    table = array('H', bytes(2 * size * len(moves)))
+    cube = CubieCube()
+    for coord in range(size):
+        setter(cube, coord)
+        row = coord * len(moves)
+        for k, move in enumerate(moves):
+            table[row + k] = getter(cube * move)
+    return table
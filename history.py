@@ -0,0 +1,105 @@
+from collections import deque
+from cube import split_moves, invert_moves
+
+
+# Undo entries are small tuples:
+#   ('moves', keys)                      undone by applying the inverse sequence
+#   ('edit', face, r, c, old, new)       one sticker recolored
+#   ('state', before, after)             CubeSnapshots around a reset/set_state/restore
+class CubeHistory:
+    def __init__(self, cube, limit=10000):
+        self.cube = cube
+        self.checkpoints = {}
+        self._undo = deque(maxlen=limit)
+        self._redo = []
+
+    def __len__(self):
+        return len(self._undo)
+
+    def can_undo(self):
+        return bool(self._undo)
+
+    def can_redo(self):
+        return bool(self._redo)
+
+    def clear(self):
+        self._undo.clear()
+        self._redo.clear()
+
+    def _record(self, entry):
+        self._undo.append(entry)
+        self._redo.clear()
+
+    def execute_move(self, notation):
+        self.execute_moves([notation])
+
+    def execute_moves(self, moves):
+        keys = split_moves(moves)
+        if keys:
+            self.cube.execute_moves(keys)
+            self._record(('moves', keys))
+
+    def scramble(self, length=20):
+        seq = self.cube.scramble(length)
+        if seq:
+            self._record(('moves', tuple(seq)))
+        return seq
+
+    def set_sticker(self, face, r, c, color):
+        old = self.cube.faces[face][r][c]
+        if old != color:
+            self.cube.faces[face][r][c] = color
+            self._record(('edit', face, r, c, old, color))
+
+    def _replace_state(self, change):
+        before = self.cube.snapshot()
+        change()
+        after = self.cube.snapshot()
+        if after != before:
+            self._record(('state', before, after))
+
+    def reset(self):
+        self._replace_state(self.cube.reset)
+
+    def set_state(self, state):
+        self._replace_state(lambda: self.cube.set_state(state))
+
+    def restore(self, snapshot):
+        self._replace_state(lambda: self.cube.restore(snapshot))
+
+    def checkpoint(self, name):
+        # Snapshots share the cube's bytes until it changes, so this costs one
+        # 54-byte copy at most.
+        snapshot = self.cube.snapshot()
+        self.checkpoints[name] = snapshot
+        return snapshot
+
+    def restore_checkpoint(self, name):
+        # Undoable like any other change.
+        self.restore(self.checkpoints[name])
+
+    def undo(self):
+        if not self._undo:
+            return False
+        entry = self._undo.pop()
+        self._apply(entry, undo=True)
+        self._redo.append(entry)
+        return True
+
+    def redo(self):
+        if not self._redo:
+            return False
+        entry = self._redo.pop()
+        self._apply(entry, undo=False)
+        self._undo.append(entry)
+        return True
+
+    def _apply(self, entry, undo):
+        kind = entry[0]
+        if kind == 'moves':
+            self.cube.execute_moves(invert_moves(entry[1]) if undo else entry[1])
+        elif kind == 'edit':
+            _, face, r, c, old, new = entry
+            self.cube.faces[face][r][c] = old if undo else new
+        else:
+            self.cube.restore(entry[1] if undo else entry[2])
@@ -1,8 +1,11 @@
+import multiprocessing
 from cube import Cube
 from renderer import RubiksCube3D
 
 
 if __name__ == "__main__":
+    # Solver processes started with spawn/forkserver re-enter a frozen build here.
+    multiprocessing.freeze_support()
     my_cube = Cube()
     app = RubiksCube3D(my_cube)
     app.run()
@@ -0,0 +1,104 @@
+from array import array
+
+
+BODY_SIZE = 0.95
+STICKER_OFFSET = 0.475
+STICKER_SIZE = 0.9
+STICKER_THICKNESS = 0.05
+BODY_COLOR = (0, 0, 0, 255)
+
+_FACE_AXES = {'U': (1, 1), 'D': (1, -1), 'F': (2, 1), 'B': (2, -1), 'L': (0, -1), 'R': (0, 1)}
+_VERTICES_PER_BOX = 36
+
+
+def _build_cubelet_sticker_indices():
+    # For every cubelet (x, y, z nested, as in draw_cube), the (face, index)
+    # pairs of its outward stickers in Cube.to_string().
+    table = []
+    for x_grid in range(3):
+        for y_grid in range(3):
+            for z_grid in range(3):
+                stickers = []
+                # U: row = z, col = x
+                if y_grid == 2: stickers.append(('U', z_grid * 3 + x_grid))
+                # D: row = 2 - z, col = x
+                if y_grid == 0: stickers.append(('D', 27 + (2 - z_grid) * 3 + x_grid))
+                # F: row = 2 - y, col = x
+                if z_grid == 2: stickers.append(('F', 18 + (2 - y_grid) * 3 + x_grid))
+                # B: row = 2 - y, col = 2 - x
+                if z_grid == 0: stickers.append(('B', 45 + (2 - y_grid) * 3 + (2 - x_grid)))
+                # L: row = 2 - y, col = z
+                if x_grid == 0: stickers.append(('L', 36 + (2 - y_grid) * 3 + z_grid))
+                # R: row = 2 - y, col = 2 - z
+                if x_grid == 2: stickers.append(('R', 9 + (2 - y_grid) * 3 + (2 - z_grid)))
+                table.append(tuple(stickers))
+    return table
+
+
+CUBELET_STICKER_INDICES = _build_cubelet_sticker_indices()
+CUBELET_POSITIONS = [(x - 1, y - 1, z - 1) for x in range(3) for y in range(3) for z in range(3)]
+
+
+def box_triangles(center, size):
+    # 12 counter-clockwise (outward facing) triangles of an axis-aligned box.
+    half = [s / 2.0 for s in size]
+    vertices = []
+    for axis in range(3):
+        for sign in (1, -1):
+            u_axis, v_axis = (axis + 1) % 3, (axis + 2) % 3
+            if sign < 0:
+                u_axis, v_axis = v_axis, u_axis
+            corners = []
+            for du, dv in ((-1, -1), (1, -1), (1, 1), (-1, 1)):
+                p = list(center)
+                p[axis] += sign * half[axis]
+                p[u_axis] += du * half[u_axis]
+                p[v_axis] += dv * half[v_axis]
+                corners.append(tuple(p))
+            vertices.extend((corners[0], corners[1], corners[2], corners[0], corners[2], corners[3]))
+    return vertices
+
+
+def cubelet_pieces(cubelet_index):
+    # (center, size, sticker index or None) for the body and each sticker of a cubelet.
+    cx, cy, cz = CUBELET_POSITIONS[cubelet_index]
+    pieces = [((cx, cy, cz), (BODY_SIZE,) * 3, None)]
+    for face, sticker in CUBELET_STICKER_INDICES[cubelet_index]:
+        axis, sign = _FACE_AXES[face]
+        center = [cx, cy, cz]
+        center[axis] += sign * STICKER_OFFSET
+        size = [STICKER_SIZE] * 3
+        size[axis] = STICKER_THICKNESS
+        pieces.append((tuple(center), tuple(size), sticker))
+    return pieces
+
+
+def build_geometry(cubelet_indices):
+    # Returns the flat xyz vertex array and, per box of 36 vertices, the sticker
+    # index it takes its color from (None for the black body).
+    vertices = array('f')
+    piece_stickers = []
+    for cubelet_index in cubelet_indices:
+        for center, size, sticker in cubelet_pieces(cubelet_index):
+            for vertex in box_triangles(center, size):
+                vertices.extend(vertex)
+            piece_stickers.append(sticker)
+    return vertices, piece_stickers
+
+
+def build_color_buffer(stickers, piece_stickers, palette, body_color=BODY_COLOR):
+    # RGBA bytes for every vertex, given the 54-character sticker string.
+    body = bytes(body_color) * _VERTICES_PER_BOX
+    per_color = {c: bytes(rgba) * _VERTICES_PER_BOX for c, rgba in palette.items()}
+    return b''.join([body if s is None else per_color[stickers[s]] for s in piece_stickers])
+
+
+def update_color_buffer(buffer, stickers, previous, piece_stickers, palette):
+    # Rewrites only the boxes whose sticker changed; returns how many were touched.
+    span = _VERTICES_PER_BOX * 4
+    changed = 0
+    for piece, s in enumerate(piece_stickers):
+        if s is not None and (previous is None or previous[s] != stickers[s]):
+            buffer[piece * span:(piece + 1) * span] = bytes(palette[stickers[s]]) * _VERTICES_PER_BOX
+            changed += 1
+    return changed
@@ -0,0 +1,161 @@
+import random
+import re
+from functools import lru_cache
+import numpy as np
+from cube import compose_perms
+
+
+FACES = 'URFDLB'
+FACE_COLORS = {'U': 'W', 'R': 'R', 'F': 'G', 'D': 'Y', 'L': 'O', 'B': 'B'}
+# Axis (x, y, z) and sign of each face's outward normal.
+_FACE_AXIS = {'U': (1, 1), 'R': (0, 1), 'F': (2, 1), 'D': (1, -1), 'L': (0, -1), 'B': (2, -1)}
+_MOVE_RE = re.compile(r"^(\d*)([URFDLB])(w?)(2'|2|')?$")
+_QUARTER_TURNS = {None: 1, '2': 2, "2'": 2, "'": 3}
+
+
+def _sticker_position(n, face, r, c):
+    # Sticker centers in doubled coordinates: cubie layers sit at -k, -k+2, .., k
+    # (k = n - 1) and face planes at +-n. Same orientation as the renderer
+    # uses for the 3x3 (e.g. U row 0 is the back edge, F row 0 the top edge).
+    k = n - 1
+    u, v = 2 * c - k, 2 * r - k
+    return {
+        'U': (u, n, v), 'D': (u, -n, -v), 'F': (u, -v, n),
+        'B': (-u, -v, -n), 'L': (-n, -v, u), 'R': (n, -v, -u),
+    }[face]
+
+
+@lru_cache(maxsize=None)
+def sticker_positions(n):
+    return [_sticker_position(n, face, r, c) for face in FACES for r in range(n) for c in range(n)]
+
+
+@lru_cache(maxsize=None)
+def layer_perm(n, face, layer):
+    # Clockwise quarter turn (seen from `face`) of the layer `layer` deep
+    # (0 = the face itself), as a list with new[i] = old[perm[i]].
+    if not 0 <= layer < n:
+        raise ValueError(f"Layer {layer + 1} out of range for a {n}x{n}x{n} cube.")
+    axis, sign = _FACE_AXIS[face]
+    b, c = (axis + 1) % 3, (axis + 2) % 3
+    depth = (n - 1) - 2 * layer
+    positions = sticker_positions(n)
+    index = {p: i for i, p in enumerate(positions)}
+    perm = list(range(len(positions)))
+    for i, p in enumerate(positions):
+        q = p[axis]
+        if abs(q) == n:
+            q = (n - 1) if q > 0 else -(n - 1)
+        if q * sign != depth:
+            continue
+        rotated = list(p)
+        rotated[b], rotated[c] = sign * p[c], -sign * p[b]
+        perm[index[tuple(rotated)]] = i
+    return perm
+
+
+def parse_move(n, notation):
+    # Returns (face, layers, quarter turns) for "R", "R'", "R2", "2R" (second
+    # layer only), "Rw"/"3Rw" (wide: outer two/three layers).
+    match = _MOVE_RE.match(notation)
+    if match is None:
+        raise ValueError(f"Unknown move: {notation}")
+    prefix, face, wide, suffix = match.groups()
+    count = int(prefix) if prefix else (2 if wide else 1)
+    if not 1 <= count <= n:
+        raise ValueError(f"Layer {count} out of range for a {n}x{n}x{n} cube: {notation}")
+    layers = tuple(range(count)) if wide else (count - 1,)
+    return face, layers, _QUARTER_TURNS[suffix]
+
+
+@lru_cache(maxsize=4096)
+def _move_perm(n, notation):
+    face, layers, turns = parse_move(n, notation)
+    perm = list(range(6 * n * n))
+    for layer in layers:
+        for _ in range(turns):
+            perm = compose_perms(perm, layer_perm(n, face, layer))
+    perm = np.array(perm, dtype=np.intp)
+    perm.flags.writeable = False
+    return perm
+
+
+@lru_cache(maxsize=4096)
+def _compile(n, moves):
+    perm = np.arange(6 * n * n, dtype=np.intp)
+    for m in moves:
+        perm = perm[_move_perm(n, m)]
+    perm.flags.writeable = False
+    return perm
+
+
+def compile_moves(n, moves):
+    if isinstance(moves, str):
+        moves = moves.split()
+    return _compile(n, tuple(moves))
+
+
+@lru_cache(maxsize=None)
+def scramble_moves(n):
+    # Outer and wide turns up to half the cube, the usual scramble alphabet.
+    names = []
+    for face in FACES:
+        for depth in range(1, n // 2 + 1):
+            base = face if depth == 1 else (face + 'w' if depth == 2 else f"{depth}{face}w")
+            names.extend(base + s for s in ('', '2', "'"))
+    return names
+
+
+class NxNCube:
+    def __init__(self, n=3):
+        if n < 2:
+            raise ValueError(f"Cube size must be at least 2, got {n}.")
+        self.n = n
+        solved = ''.join(FACE_COLORS[f] * (n * n) for f in FACES)
+        self._solved = np.frombuffer(solved.encode('ascii'), dtype=np.uint8)
+        self.stickers = self._solved.copy()
+        self.version = 0
+
+    @classmethod
+    def from_string(cls, n, stickers):
+        if len(stickers) != 6 * n * n:
+            raise ValueError(f"Sticker string wrong length: {len(stickers)} (expected {6 * n * n}).")
+        cube = cls(n)
+        cube.stickers = np.frombuffer(stickers.encode('ascii'), dtype=np.uint8).copy()
+        return cube
+
+    def copy(self):
+        cube = NxNCube(self.n)
+        cube.stickers = self.stickers.copy()
+        return cube
+
+    def reset(self):
+        self.stickers = self._solved.copy()
+        self.version += 1
+
+    def face(self, face):
+        # (n, n) view of one face's stickers, rows top to bottom.
+        i = FACES.index(face) * self.n * self.n
+        return self.stickers[i:i + self.n * self.n].reshape(self.n, self.n)
+
+    def is_solved(self):
+        faces = self.stickers.reshape(6, -1)
+        return bool((faces == faces[:, :1]).all())
+
+    def to_string(self):
+        return self.stickers.tobytes().decode('ascii')
+
+    def execute_move(self, notation):
+        if notation:
+            self.stickers = self.stickers[_move_perm(self.n, notation)]
+            self.version += 1
+
+    def execute_moves(self, moves):
+        self.stickers = self.stickers[compile_moves(self.n, moves)]
+        self.version += 1
+
+    def scramble(self, length=20):
+        names = scramble_moves(self.n)
+        seq = [random.choice(names) for _ in range(length)]
+        self.execute_moves(seq)
+        return seq
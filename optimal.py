@@ -0,0 +1,312 @@
+import argparse
+import mmap
+import os
+import sys
+import time
+from cube import MOVES, CubieCube, cubie_moves
+
+
+TABLE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tables')
+
+N_TWIST = 2187
+N_CORNER_PERM = 40320
+N_CORNER = N_CORNER_PERM * N_TWIST
+N_EDGE_POS = 665280
+N_EDGE = N_EDGE_POS * 64
+EDGE_GROUPS = {'edges_a': (0, 1, 2, 3, 4, 5), 'edges_b': (6, 7, 8, 9, 10, 11)}
+
+_PDB_MAGIC = b'RCPDB1\0\0'
+_UNSEEN = 15
+
+
+def _edge_position_rank(positions):
+    rank = 0
+    for k, p in enumerate(positions):
+        rank = rank * (12 - k) + p - sum(1 for q in positions[:k] if q < p)
+    return rank
+
+
+def corner_index(cc):
+    return cc.get_corner_perm() * N_TWIST + cc.get_twist()
+
+
+def edge_index(cc, group):
+    where = {e: i for i, e in enumerate(cc.ep)}
+    positions = [where[e] for e in group]
+    ori = 0
+    for k, p in enumerate(positions):
+        ori |= cc.eo[p] << k
+    return _edge_position_rank(positions) * 64 + ori
+
+
+def _pdb_path(table_dir, name):
+    return os.path.join(table_dir, name + '.pdb')
+
+
+def _move_table_path(table_dir, name):
+    return os.path.join(table_dir, name + '.mt')
+
+
+# --- table generation (needs NumPy, run once) ---
+
+def _lehmer_rank(np, perms):
+    n = perms.shape[1]
+    rank = np.zeros(perms.shape[0], dtype=np.int64)
+    for i in range(n):
+        smaller = (perms[:, i + 1:] < perms[:, i:i + 1]).sum(axis=1)
+        rank = rank * (n - i) + smaller
+    return rank
+
+
+def _partial_rank(np, positions):
+    rank = np.zeros(positions.shape[0], dtype=np.int64)
+    for k in range(positions.shape[1]):
+        smaller = (positions[:, :k] < positions[:, k:k + 1]).sum(axis=1)
+        rank = rank * (12 - k) + positions[:, k] - smaller
+    return rank
+
+
+def _build_move_tables(np):
+    from itertools import permutations
+    moves = [cubie_moves()[m] for m in MOVES]
+
+    perms = np.array(list(permutations(range(8))), dtype=np.int8)
+    corner_perm = np.empty((N_CORNER_PERM, len(moves)), dtype=np.uint32)
+    for k, mv in enumerate(moves):
+        corner_perm[:, k] = _lehmer_rank(np, perms[:, mv.cp])
+
+    digits = np.zeros((N_TWIST, 8), dtype=np.int64)
+    t = np.arange(N_TWIST)
+    for i in range(6, -1, -1):
+        digits[:, i] = t % 3
+        t //= 3
+    digits[:, 7] = (3 - digits[:, :7].sum(axis=1) % 3) % 3
+    twist = np.empty((N_TWIST, len(moves)), dtype=np.uint32)
+    for k, mv in enumerate(moves):
+        co = (digits[:, mv.cp] + np.array(mv.co)) % 3
+        value = np.zeros(N_TWIST, dtype=np.int64)
+        for i in range(7):
+            value = value * 3 + co[:, i]
+        twist[:, k] = value
+
+    # Entry = new position rank * 64 + orientation flips picked up by the
+    # tracked edges, so a move is `table[rank * 18 + m] ^ orientation`.
+    positions = np.array(list(permutations(range(12), 6)), dtype=np.int8)
+    edges = np.empty((N_EDGE_POS, len(moves)), dtype=np.uint32)
+    for k, mv in enumerate(moves):
+        inv = np.empty(12, dtype=np.int8)
+        inv[np.array(mv.ep)] = np.arange(12)
+        new_pos = inv[positions]
+        flips = np.array(mv.eo, dtype=np.int64)[new_pos]
+        delta = (flips << np.arange(6)).sum(axis=1)
+        edges[:, k] = _partial_rank(np, new_pos) * 64 + delta
+    return {'corner_perm': corner_perm, 'twist': twist, 'edges': edges}
+
+
+def _bfs(np, size, start, neighbours, name, report, chunk=1 << 21):
+    depth = np.full(size, _UNSEEN, dtype=np.uint8)
+    depth[start] = 0
+    seen, d = 1, 0
+    report(f"{name}: depth 0: 1 / {size}")
+    while seen < size:
+        began = time.perf_counter()
+        found = 0
+        if seen < size - seen:
+            frontier = np.flatnonzero(depth == d)
+            for lo in range(0, frontier.size, chunk):
+                for nb in neighbours(frontier[lo:lo + chunk]):
+                    nb = nb[depth[nb] == _UNSEEN]
+                    depth[nb] = d + 1
+        else:
+            unseen = np.flatnonzero(depth == _UNSEEN)
+            for lo in range(0, unseen.size, chunk):
+                block = unseen[lo:lo + chunk]
+                hit = np.zeros(block.size, dtype=bool)
+                for nb in neighbours(block):
+                    hit |= depth[nb] == d
+                depth[block[hit]] = d + 1
+        found = int(np.count_nonzero(depth == d + 1))
+        if found == 0:
+            break
+        seen += found
+        d += 1
+        report(f"{name}: depth {d}: {found} new, {seen} / {size} ({time.perf_counter() - began:.1f}s)")
+    return depth
+
+
+def _write_pdb(np, path, depth):
+    if depth.size % 2:
+        depth = np.append(depth, np.uint8(_UNSEEN))
+    packed = depth[0::2] | (depth[1::2] << 4)
+    with open(path + '.tmp', 'wb') as f:
+        f.write(_PDB_MAGIC)
+        f.write(int(depth.size).to_bytes(8, 'little'))
+        packed.tofile(f)
+    os.replace(path + '.tmp', path)
+
+
+def generate_tables(table_dir=TABLE_DIR, report=None):
+    import numpy as np
+    report = report or (lambda msg: print(msg, file=sys.stderr, flush=True))
+    os.makedirs(table_dir, exist_ok=True)
+
+    began = time.perf_counter()
+    tables = _build_move_tables(np)
+    for name, table in tables.items():
+        table.astype('<u4').tofile(_move_table_path(table_dir, name))
+    report(f"move tables: {time.perf_counter() - began:.1f}s")
+
+    cp_table = tables['corner_perm'].astype(np.int64)
+    tw_table = tables['twist'].astype(np.int64)
+
+    def corner_neighbours(idx):
+        cp, tw = idx // N_TWIST, idx % N_TWIST
+        for k in range(len(MOVES)):
+            yield cp_table[cp, k] * N_TWIST + tw_table[tw, k]
+
+    depth = _bfs(np, N_CORNER, 0, corner_neighbours, 'corner', report)
+    _write_pdb(np, _pdb_path(table_dir, 'corner'), depth)
+    del depth
+
+    edge_table = tables['edges'].astype(np.int64)
+
+    def edge_neighbours(idx):
+        pos, ori = idx >> 6, idx & 63
+        for k in range(len(MOVES)):
+            yield edge_table[pos, k] ^ ori
+
+    for name, group in EDGE_GROUPS.items():
+        depth = _bfs(np, N_EDGE, edge_index(CubieCube(), group), edge_neighbours, name, report)
+        _write_pdb(np, _pdb_path(table_dir, name), depth)
+        del depth
+    report(f"all tables written to {table_dir} in {time.perf_counter() - began:.1f}s")
+
+
+# --- search (pure Python on memory-mapped tables) ---
+
+def _map_file(path):
+    with open(path, 'rb') as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class _PatternDatabase:
+    def __init__(self, path):
+        self._mm = _map_file(path)
+        if self._mm[:8] != _PDB_MAGIC:
+            raise ValueError(f"{path} is not a pattern database file.")
+        self.size = int.from_bytes(self._mm[8:16], 'little')
+        self._data = memoryview(self._mm)[16:]
+
+    def __getitem__(self, idx):
+        return (self._data[idx >> 1] >> ((idx & 1) << 2)) & 15
+
+
+def _load_move_table(path):
+    if sys.byteorder != 'little':
+        raise RuntimeError("Move tables are stored little-endian.")
+    return memoryview(_map_file(path)).cast('I')
+
+
+class OptimalSolver:
+    def __init__(self, table_dir=TABLE_DIR):
+        missing = [p for p in self._table_paths(table_dir) if not os.path.exists(p)]
+        if missing:
+            raise FileNotFoundError(f"Missing pattern tables {missing}; run 'python optimal.py generate' first.")
+        self._corner_perm = _load_move_table(_move_table_path(table_dir, 'corner_perm'))
+        self._twist = _load_move_table(_move_table_path(table_dir, 'twist'))
+        self._edges = _load_move_table(_move_table_path(table_dir, 'edges'))
+        self._corner_pdb = _PatternDatabase(_pdb_path(table_dir, 'corner'))
+        self._edge_pdbs = [_PatternDatabase(_pdb_path(table_dir, name)) for name in EDGE_GROUPS]
+        solved = CubieCube()
+        self._goal = (0, edge_index(solved, EDGE_GROUPS['edges_a']), edge_index(solved, EDGE_GROUPS['edges_b']))
+        self.last_stats = None
+
+    @staticmethod
+    def _table_paths(table_dir):
+        paths = [_move_table_path(table_dir, n) for n in ('corner_perm', 'twist', 'edges')]
+        return paths + [_pdb_path(table_dir, n) for n in ['corner'] + list(EDGE_GROUPS)]
+
+    def solve_facelets(self, facelets, max_depth=20):
+        cc = CubieCube.from_facelets(facelets)
+        if not cc.is_solvable():
+            raise ValueError("Cube state is not solvable.")
+        start = (corner_index(cc), edge_index(cc, EDGE_GROUPS['edges_a']), edge_index(cc, EDGE_GROUPS['edges_b']))
+
+        began = time.perf_counter()
+        self._nodes = 0
+        path = []
+        bound = self._heuristic(*start)
+        solution = None
+        while bound <= max_depth:
+            result = self._search(start, 0, bound, -1, path)
+            if result is True:
+                solution = [MOVES[m] for m in path]
+                break
+            bound = result
+        elapsed = time.perf_counter() - began
+        self.last_stats = {
+            'nodes': self._nodes, 'seconds': elapsed,
+            'nodes_per_second': self._nodes / elapsed if elapsed > 0 else 0.0,
+            'depth': len(solution) if solution is not None else None
+        }
+        if solution is None:
+            raise ValueError(f"No solution within {max_depth} moves.")
+        return solution
+
+    def _heuristic(self, corner, edge_a, edge_b):
+        return max(self._corner_pdb[corner], self._edge_pdbs[0][edge_a], self._edge_pdbs[1][edge_b])
+
+    def _search(self, state, g, bound, last_face, path):
+        self._nodes += 1
+        corner, edge_a, edge_b = state
+        h = self._heuristic(corner, edge_a, edge_b)
+        if g + h > bound:
+            return g + h
+        if state == self._goal:
+            return True
+        cp, tw = divmod(corner, N_TWIST)
+        cp_row, tw_row = cp * 18, tw * 18
+        a_row, a_ori = (edge_a >> 6) * 18, edge_a & 63
+        b_row, b_ori = (edge_b >> 6) * 18, edge_b & 63
+        best = 255
+        for m in range(18):
+            face = m // 3
+            # Skip a second turn of the same face, and fix the order of turns
+            # on opposite faces (they commute).
+            if face == last_face or (face % 3 == last_face % 3 and face < last_face):
+                continue
+            child = (self._corner_perm[cp_row + m] * N_TWIST + self._twist[tw_row + m],
+                     self._edges[a_row + m] ^ a_ori, self._edges[b_row + m] ^ b_ori)
+            path.append(m)
+            result = self._search(child, g + 1, bound, face, path)
+            if result is True:
+                return True
+            path.pop()
+            if result < best:
+                best = result
+        return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Optimal solver pattern tables.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    gen = sub.add_parser('generate', help="Generate move tables and pattern databases.")
+    gen.add_argument('--dir', default=TABLE_DIR)
+    solve = sub.add_parser('solve', help="Optimally solve facelet strings given as arguments.")
+    solve.add_argument('--dir', default=TABLE_DIR)
+    solve.add_argument('facelets', nargs='+')
+    args = parser.parse_args(argv)
+
+    if args.command == 'generate':
+        generate_tables(args.dir)
+    else:
+        solver = OptimalSolver(args.dir)
+        for facelets in args.facelets:
+            solution = solver.solve_facelets(facelets)
+            stats = solver.last_stats
+            print(f"{' '.join(solution)}  ({len(solution)} moves, {stats['nodes']} nodes, "
+                  f"{stats['nodes_per_second']:.0f} nodes/s)")
+
+
+if __name__ == '__main__':
+    main()
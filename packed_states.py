@@ -0,0 +1,204 @@
+import os
+from math import factorial
+from cube import N_CORNER_PERM, N_FLIP, N_TWIST, CubieCube, perm_parity, rank_perm, unrank_perm
+
+
+# A solvable state is ranked as corner permutation x twist x edge permutation
+# x flip. The edge permutation's parity always equals the corner one, so only
+# half of the 12! edge permutations are counted. 40320 * 2187 * 12!/2 * 2048
+# is just under 2**66.
+N_EDGE_HALF = factorial(12) // 2
+N_CORNER_COORD = N_CORNER_PERM * N_TWIST
+N_EDGE_COORD = N_EDGE_HALF * N_FLIP
+N_STATES = N_CORNER_COORD * N_EDGE_COORD
+
+# Dataset files: 8-byte magic, record count (<u8), then 9-byte records holding
+# the corner coordinate (<u4) and the edge coordinate (40 bits, little-endian).
+RECORD_SIZE = 9
+HEADER_SIZE = 16
+_DATASET_MAGIC = b'RCSTATE1'
+
+
+def encode_cubie(cc):
+    # Raises ValueError for states that cannot be reached by turning the cube.
+    if not cc.is_solvable():
+        raise ValueError(f"Cannot encode an unsolvable state: {cc}")
+    corners = rank_perm(cc.cp) * N_TWIST + cc.get_twist()
+    edges = (rank_perm(cc.ep) >> 1) * N_FLIP + cc.get_flip()
+    return corners * N_EDGE_COORD + edges
+
+
+def decode_cubie(rank):
+    if not 0 <= rank < N_STATES:
+        raise ValueError(f"State rank out of range: {rank}")
+    corners, edges = divmod(rank, N_EDGE_COORD)
+    cc = CubieCube()
+    cc.cp = unrank_perm(corners // N_TWIST, 8)
+    cc.set_twist(corners % N_TWIST)
+    half, flip = divmod(edges, N_FLIP)
+    # The dropped lowest Lehmer digit is whatever makes the parities agree.
+    ep = unrank_perm(half << 1, 12)
+    cc.ep = unrank_perm((half << 1) | (perm_parity(ep) ^ perm_parity(cc.cp)), 12)
+    cc.set_flip(flip)
+    return cc
+
+
+def encode_facelets(facelets):
+    return encode_cubie(CubieCube.from_facelets(facelets))
+
+
+def decode_facelets(rank):
+    return decode_cubie(rank).to_facelets()
+
+
+def encode_cube(cube):
+    return encode_cubie(CubieCube.from_cube(cube))
+
+
+def pack_record(rank):
+    corners, edges = divmod(rank, N_EDGE_COORD)
+    return corners.to_bytes(4, 'little') + edges.to_bytes(5, 'little')
+
+
+def unpack_record(record):
+    corners = int.from_bytes(record[:4], 'little')
+    edges = int.from_bytes(record[4:RECORD_SIZE], 'little')
+    return corners * N_EDGE_COORD + edges
+
+
+# --- vectorized encoding and dataset files (need NumPy) ---
+
+def record_dtype():
+    import numpy as np
+    return np.dtype([('corners', '<u4'), ('edges_lo', '<u4'), ('edges_hi', 'u1')])
+
+
+def _rank_rows(np, perms):
+    n = perms.shape[1]
+    rank = np.zeros(perms.shape[0], dtype=np.int64)
+    digit_sum = np.zeros(perms.shape[0], dtype=np.int64)
+    for i in range(n):
+        smaller = (perms[:, i + 1:] < perms[:, i:i + 1]).sum(axis=1)
+        rank = rank * (n - i) + smaller
+        digit_sum += smaller
+    return rank, digit_sum & 1
+
+
+def _lehmer_digits(np, ranks, n):
+    digits = np.empty((ranks.shape[0], n), dtype=np.int64)
+    for i in range(n - 1, -1, -1):
+        digits[:, i] = ranks % (n - i)
+        ranks = ranks // (n - i)
+    return digits
+
+
+def _unrank_rows(np, ranks, n):
+    digits = _lehmer_digits(np, ranks, n)
+    available = np.ones((ranks.shape[0], n), dtype=bool)
+    perms = np.empty((ranks.shape[0], n), dtype=np.int64)
+    for i in range(n):
+        # Position of the digits[i]-th still unused value.
+        pick = ((np.cumsum(available, axis=1) == digits[:, i:i + 1] + 1) & available).argmax(axis=1)
+        perms[:, i] = pick
+        available[np.arange(ranks.shape[0]), pick] = False
+    return perms, digits.sum(axis=1) & 1
+
+
+def encode_cubie_arrays(cp, co, ep, eo):
+    # Records for (N, 8)/(N, 12) cubie arrays of solvable states, e.g. from
+    # scrambler.random_cubies.
+    import numpy as np
+    cp_rank, _ = _rank_rows(np, np.asarray(cp))
+    ep_rank, _ = _rank_rows(np, np.asarray(ep))
+    twist = np.zeros(cp_rank.shape[0], dtype=np.int64)
+    for i in range(7):
+        twist = twist * 3 + np.asarray(co)[:, i]
+    flip = np.zeros(ep_rank.shape[0], dtype=np.int64)
+    for i in range(11):
+        flip = flip * 2 + np.asarray(eo)[:, i]
+    edges = (ep_rank >> 1) * N_FLIP + flip
+    records = np.empty(cp_rank.shape[0], dtype=record_dtype())
+    records['corners'] = cp_rank * N_TWIST + twist
+    records['edges_lo'] = edges & 0xFFFFFFFF
+    records['edges_hi'] = edges >> 32
+    return records
+
+
+def decode_cubie_arrays(records):
+    import numpy as np
+    corners = records['corners'].astype(np.int64)
+    edges = records['edges_lo'].astype(np.int64) | (records['edges_hi'].astype(np.int64) << 32)
+    cp, corner_parity = _unrank_rows(np, corners // N_TWIST, 8)
+    half, flip = edges // N_FLIP, edges % N_FLIP
+    # The dropped lowest Lehmer digit is whatever makes the parities agree.
+    parity = _lehmer_digits(np, half << 1, 12).sum(axis=1) & 1
+    ep, _ = _unrank_rows(np, (half << 1) | (parity ^ corner_parity), 12)
+
+    co = np.empty((len(records), 8), dtype=np.int64)
+    twist = corners % N_TWIST
+    for i in range(6, -1, -1):
+        co[:, i] = twist % 3
+        twist //= 3
+    co[:, 7] = (-co[:, :7].sum(axis=1)) % 3
+    eo = np.empty((len(records), 12), dtype=np.int64)
+    for i in range(10, -1, -1):
+        eo[:, i] = flip & 1
+        flip >>= 1
+    eo[:, 11] = eo[:, :11].sum(axis=1) & 1
+    return cp, co, ep, eo
+
+
+def encode_facelet_array(facelets):
+    # Records for an (N, 54) array of URFDLB letters or a list of facelet
+    # strings. Validates the whole batch first.
+    import numpy as np
+    from validation import REASONS, facelet_array_to_cubies, validate_facelet_array
+    if not isinstance(facelets, np.ndarray):
+        facelets = np.frombuffer(''.join(facelets).encode('ascii'), dtype=np.uint8).reshape(-1, 54)
+    reasons = validate_facelet_array(facelets)
+    if reasons.any():
+        row = int(reasons.nonzero()[0][0])
+        raise ValueError(f"State {row} cannot be encoded: {REASONS[reasons[row]]}")
+    return encode_cubie_arrays(*facelet_array_to_cubies(facelets))
+
+
+def decode_facelet_array(records):
+    from scrambler import cubies_to_facelet_array
+    return cubies_to_facelet_array(*decode_cubie_arrays(records))
+
+
+def write_dataset(path, batches):
+    # Streams batches of records (arrays of record_dtype()) to a dataset file.
+    count = 0
+    with open(path + '.tmp', 'wb') as f:
+        f.write(_DATASET_MAGIC)
+        f.write(bytes(8))
+        for records in batches:
+            records.tofile(f)
+            count += len(records)
+        f.seek(len(_DATASET_MAGIC))
+        f.write(count.to_bytes(8, 'little'))
+    os.replace(path + '.tmp', path)
+    return count
+
+
+def open_dataset(path, mode='r'):
+    # A NumPy memmap of the records; indexing and slicing read from disk on demand.
+    import numpy as np
+    with open(path, 'rb') as f:
+        header = f.read(HEADER_SIZE)
+    if header[:8] != _DATASET_MAGIC:
+        raise ValueError(f"{path} is not a state dataset file.")
+    count = int.from_bytes(header[8:16], 'little')
+    if count == 0:
+        return np.zeros(0, dtype=record_dtype())
+    return np.memmap(path, dtype=record_dtype(), mode=mode, offset=HEADER_SIZE, shape=(count,))
+
+
+def iter_dataset(path, batch_size=100000):
+    # Yields facelet strings, decoding batch_size records at a time.
+    records = open_dataset(path)
+    for start in range(0, len(records), batch_size):
+        data = decode_facelet_array(records[start:start + batch_size]).tobytes()
+        for i in range(0, len(data), 54):
+            yield data[i:i + 54].decode('ascii')
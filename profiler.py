@@ -0,0 +1,113 @@
+import csv
+import json
+import time
+from array import array
+from collections import deque
+
+
+class FrameProfiler:
+    PHASES = ('handle_input', 'update', 'draw_cube', 'coloring_ui', 'overlay', 'present', 'frame')
+
+    def __init__(self, enabled=False, capacity=600):
+        self.enabled = enabled
+        self.capacity = capacity
+        self.frames = 0
+        self._index = 0
+        self._samples = {phase: array('d', bytes(8 * capacity)) for phase in self.PHASES}
+        self._draw_calls = array('l', bytes(array('l').itemsize * capacity))
+        self._solves = deque(maxlen=capacity)
+        self._frame_start = 0.0
+        self._last_mark = 0.0
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self._frame_start = self._last_mark = now
+        for phase in self.PHASES:
+            self._samples[phase][self._index] = 0.0
+        self._draw_calls[self._index] = 0
+
+    def mark(self, phase):
+        # Charges the time since the previous mark (or frame start) to `phase`.
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self._samples[phase][self._index] += now - self._last_mark
+        self._last_mark = now
+
+    def count_draw_calls(self, count):
+        if self.enabled:
+            self._draw_calls[self._index] += count
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        self._samples['frame'][self._index] = time.perf_counter() - self._frame_start
+        self._index = (self._index + 1) % self.capacity
+        self.frames += 1
+
+    def record_solve(self, milliseconds, state):
+        self._solves.append((time.time(), milliseconds, state))
+
+    def _recent(self, values):
+        count = min(self.frames, self.capacity)
+        if count < self.capacity:
+            return list(values[:count])
+        return list(values[self._index:]) + list(values[:self._index])
+
+    def phase_times(self, phase):
+        return self._recent(self._samples[phase])
+
+    def draw_calls(self):
+        return self._recent(self._draw_calls)
+
+    def solves(self):
+        return list(self._solves)
+
+    def histogram(self, phase, bins=10, max_ms=None):
+        values = [v * 1000.0 for v in self.phase_times(phase)]
+        if not values:
+            return [0] * bins, 0.0
+        top = max_ms or max(values) or 1.0
+        counts = [0] * bins
+        for v in values:
+            counts[min(bins - 1, int(v / top * bins))] += 1
+        return counts, top
+
+    def summary(self):
+        result = {}
+        for phase in self.PHASES:
+            values = sorted(self.phase_times(phase))
+            if not values:
+                continue
+            result[phase] = {
+                'p50_ms': values[len(values) // 2] * 1000.0,
+                'p95_ms': values[min(len(values) - 1, int(len(values) * 0.95))] * 1000.0,
+                'max_ms': values[-1] * 1000.0,
+            }
+        calls = self.draw_calls()
+        if calls:
+            result['draw_calls'] = {'mean': sum(calls) / len(calls), 'max': max(calls)}
+        if self._solves:
+            result['solve_ms'] = [ms for _, ms, _ in self._solves]
+        return result
+
+    def dump(self, path):
+        frames = list(zip(*(self.phase_times(p) for p in self.PHASES), self.draw_calls()))
+        if path.endswith('.csv'):
+            with open(path, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow([f'{p}_ms' for p in self.PHASES] + ['draw_calls'])
+                for row in frames:
+                    writer.writerow([f'{v * 1000.0:.4f}' for v in row[:-1]] + [row[-1]])
+        else:
+            with open(path, 'w') as f:
+                json.dump({
+                    'phases': list(self.PHASES),
+                    'frames': [{**{p: v * 1000.0 for p, v in zip(self.PHASES, row)}, 'draw_calls': row[-1]}
+                               for row in frames],
+                    'solves': [{'time': t, 'ms': ms, 'state': s} for t, ms, s in self._solves],
+                    'summary': self.summary(),
+                }, f, indent=1)
+        return path
@@ -1,15 +1,91 @@
 import pyray
 import math
+import os
+import time
 from pyray import Vector2, Vector3, Camera3D, CAMERA_PERSPECTIVE, KeyboardKey
-from cube import Cube
-from solver import KociembaSolver
+from cube import Cube, simplify_moves
+from solution_cache import SolutionCache
+from solver import SolveJob
+from solver_server import connect_solver
+from profiler import FrameProfiler
+from history import CubeHistory
+from mesh import CUBELET_STICKER_INDICES, build_color_buffer, build_geometry, update_color_buffer
+
+_NO_STICKERS = {face: 'NONE' for face in 'UDFBLR'}
+
+
+class _CubeMeshes:
+    # GPU meshes for the whole cube and, per face, its turning layer and the
+    # rest of the cube. Vertex colors are re-uploaded only when the cube's
+    # state version changes.
+    def __init__(self, palette, layers):
+        self.palette = palette
+        self.groups = {'all': range(27)}
+        for face, cubelets in layers.items():
+            self.groups['layer_' + face] = sorted(cubelets)
+            self.groups['rest_' + face] = [i for i in range(27) if i not in cubelets]
+        self.material = pyray.load_material_default()
+        self._identity = pyray.matrix_identity()
+        self._meshes = {}
+
+    def _load(self, key):
+        vertices, piece_stickers = build_geometry(self.groups[key])
+        mesh = pyray.Mesh()
+        mesh.vertexCount = len(vertices) // 3
+        mesh.triangleCount = mesh.vertexCount // 3
+        mesh.vertices = pyray.ffi.cast("float *", pyray.mem_alloc(len(vertices) * 4))
+        pyray.ffi.memmove(mesh.vertices, vertices.tobytes(), len(vertices) * 4)
+        mesh.texcoords = pyray.ffi.cast("float *", pyray.mem_alloc(mesh.vertexCount * 2 * 4))
+        mesh.colors = pyray.ffi.cast("unsigned char *", pyray.mem_alloc(mesh.vertexCount * 4))
+        pyray.upload_mesh(mesh, True)
+        entry = {'mesh': mesh, 'pieces': piece_stickers, 'colors': None, 'stickers': None, 'version': None}
+        self._meshes[key] = entry
+        return entry
+
+    def _sync(self, key, cube):
+        entry = self._meshes.get(key) or self._load(key)
+        if entry['version'] != cube.version:
+            stickers = cube.to_string()
+            if entry['colors'] is None:
+                entry['colors'] = bytearray(build_color_buffer(stickers, entry['pieces'], self.palette))
+                changed = True
+            else:
+                changed = update_color_buffer(entry['colors'], stickers, entry['stickers'], entry['pieces'], self.palette)
+            if changed:
+                data = pyray.ffi.from_buffer(entry['colors'])
+                pyray.update_mesh_buffer(entry['mesh'], 3, pyray.ffi.cast("void *", data), len(data), 0)
+            entry['stickers'] = stickers
+            entry['version'] = cube.version
+        return entry['mesh']
+
+    def draw(self, cube, layer_face=None, axis=None, angle_degrees=0.0):
+        if layer_face is None:
+            pyray.draw_mesh(self._sync('all', cube), self.material, self._identity)
+            return 1
+        pyray.draw_mesh(self._sync('rest_' + layer_face, cube), self.material, self._identity)
+        rotation = pyray.matrix_rotate(axis, math.radians(angle_degrees))
+        pyray.draw_mesh(self._sync('layer_' + layer_face, cube), self.material, rotation)
+        return 2
+
+    def unload(self):
+        for entry in self._meshes.values():
+            pyray.unload_mesh(entry['mesh'])
+        self._meshes = {}
+
 
 class RubiksCube3D:
     def __init__(self, cube_instance):
         self.cube = cube_instance
-        self.solver = KociembaSolver()
+        # All changes to the cube go through here so Z/Y can undo and redo them.
+        self.history = CubeHistory(self.cube)
+        # Uses a running solver server when there is one, else solves in-process
+        # (with a persistent solution cache if RUBIKS_SOLUTION_CACHE names a file).
+        cache_path = os.environ.get('RUBIKS_SOLUTION_CACHE')
+        cache = SolutionCache(path=cache_path) if cache_path else None
+        self.solver = connect_solver(cache=cache)
         self.solution = []
         self.solve_index = 0
+        self.solve_job = None
         self.is_solving_all = False
         self.move_timer = 0
         self.MOVE_DELAY = 30 
@@ -20,6 +96,13 @@ class RubiksCube3D:
         self.color_picker_pos = Vector2(0, 0)
         self.camera_is_movable = True
 
+        self.use_mesh_renderer = os.environ.get('RUBIKS_IMMEDIATE_MODE') != '1'
+        self.cube_meshes = None
+        self.profiler = FrameProfiler(enabled=os.environ.get('RUBIKS_PROFILE') == '1')
+        self.show_profiler = self.profiler.enabled
+        # Seconds to spend searching for shorter solutions; unset or 0 takes the first one.
+        self.solve_budget = float(os.environ.get('RUBIKS_SOLVE_BUDGET') or 0) or None
+
         self.screen_width = 800
         self.screen_height = 800
         pyray.init_window(self.screen_width, self.screen_height, "3D Rubik's Cube Solver")
@@ -52,10 +135,14 @@ class RubiksCube3D:
         self.pause_timer = 0
 
         # Additional animation details stored when a move begins:
-        self.anim_layer_indices = []
+        self.anim_layer_indices = frozenset()
         self.anim_axis = Vector3(0,0,0)
         self.anim_total_angle = 0.0
         self.anim_color_map = {}
+        self.anim_face = None
+        self._facelet_colors = None
+        self._facelet_colors_version = None
+        self._layer_cubelets = {f: frozenset(self._get_cubelets_in_layer(f)) for f in 'UDFBLR'}
         
         self.cubelet_grid_positions = self._initialize_cubelet_grid_positions()
         
@@ -76,50 +163,36 @@ class RubiksCube3D:
         return grid_positions
 
     def _generate_facelet_positions_map(self):
+        stickers = self.cube.to_string()
         facelet_colors_map = {}
-        cubelet_index = 0
-        for x_grid in range(3):
-            for y_grid in range(3):
-                for z_grid in range(3):
-                    colors = {}
-                    # U: row = z, col = x
-                    if y_grid == 2: colors['U'] = self.cube.faces['U'][z_grid][x_grid]
-                    else: colors['U'] = 'NONE'
-                    # ** FIX **: The D-face mapping was inverted along the z-axis.
-                    # From below, the front row (row=0) corresponds to the front cubelets (z=2).
-                    # D: row = 2 - z, col = x
-                    if y_grid == 0: colors['D'] = self.cube.faces['D'][2 - z_grid][x_grid]
-                    else: colors['D'] = 'NONE'
-                    # F: row = 2 - y, col = x
-                    if z_grid == 2: colors['F'] = self.cube.faces['F'][2 - y_grid][x_grid]
-                    else: colors['F'] = 'NONE'
-                    # B: row = 2 - y, col = 2 - x
-                    if z_grid == 0: colors['B'] = self.cube.faces['B'][2 - y_grid][2 - x_grid]
-                    else: colors['B'] = 'NONE'
-                    # L: row = 2 - y, col = z
-                    if x_grid == 0: colors['L'] = self.cube.faces['L'][2 - y_grid][z_grid]
-                    else: colors['L'] = 'NONE'
-                    # R: row = 2 - y, col = 2 - z
-                    if x_grid == 2: colors['R'] = self.cube.faces['R'][2 - y_grid][2 - z_grid]
-                    else: colors['R'] = 'NONE'
-
-                    facelet_colors_map[cubelet_index] = colors
-                    cubelet_index += 1
+        for cubelet_index, faces in enumerate(CUBELET_STICKER_INDICES):
+            colors = _NO_STICKERS.copy()
+            for face, idx in faces:
+                colors[face] = stickers[idx]
+            facelet_colors_map[cubelet_index] = colors
         return facelet_colors_map
 
+    def _current_facelet_colors(self):
+        if self._facelet_colors_version != self.cube.version:
+            self._facelet_colors = self._generate_facelet_positions_map()
+            self._facelet_colors_version = self.cube.version
+        return self._facelet_colors
+
     
     def update(self):
         self.handle_input()
+        self.profiler.mark('handle_input')
+        self._poll_solve_job()
         
         if self.is_solving_all:
             if self.is_animating_move:
                 self.animation_progress += 1
                 if self.animation_progress >= self.ANIMATION_FRAMES:
                     # Apply logical move and stop animation
-                    self.cube.execute_move(self.current_move_notation)
+                    self.history.execute_move(self.current_move_notation)
                     self.is_animating_move = False
                     self.animation_progress = 0.0
-                    self.anim_layer_indices = []
+                    self.anim_layer_indices = frozenset()
                     self.anim_axis = Vector3(0,0,0)
                     self.anim_total_angle = 0.0
                     self.pause_timer = 30 
@@ -137,12 +210,13 @@ class RubiksCube3D:
         if self.is_animating_move and not self.is_solving_all:
             self.animation_progress += 1
             if self.animation_progress >= self.ANIMATION_FRAMES:
-                self.cube.execute_move(self.current_move_notation)
+                self.history.execute_move(self.current_move_notation)
                 self.is_animating_move = False
                 self.animation_progress = 0.0
-                self.anim_layer_indices = []
+                self.anim_layer_indices = frozenset()
                 self.anim_axis = Vector3(0,0,0)
                 self.anim_total_angle = 0.0
+        self.profiler.mark('update')
 
     def start_animation_for_move(self, notation):
         if self.is_animating_move: return
@@ -170,15 +244,16 @@ class RubiksCube3D:
         total_angle *= -1.0  
 
         self.anim_axis = axis
+        self.anim_face = face_char
         self.anim_total_angle = total_angle
-        self.anim_layer_indices = self._get_cubelets_in_layer(face_char)
+        self.anim_layer_indices = self._layer_cubelets[face_char]
         
-        self.anim_color_map = self._generate_facelet_positions_map()
+        self.anim_color_map = self._current_facelet_colors()
         
         self.is_animating_move = True
 
         print(f"Starting animation for move: {notation}. "
-            f"Layer cubelets: {self.anim_layer_indices}, "
+            f"Layer cubelets: {sorted(self.anim_layer_indices)}, "
             f"axis: {self.anim_axis}, angle: {self.anim_total_angle}")
 
     def _get_cubelets_in_layer(self, face_char):
@@ -196,18 +271,34 @@ class RubiksCube3D:
                     cubelet_index += 1
         return layer_indices
 
+    def _current_animation_angle(self):
+        if not self.is_animating_move: return 0.0
+        prog = max(0.0, min(self.animation_progress, self.ANIMATION_FRAMES))
+        fraction = prog / float(self.ANIMATION_FRAMES)
+        return fraction * self.anim_total_angle
+
+    def _draw_cube_mesh(self):
+        if self.cube_meshes is None:
+            self.cube_meshes = _CubeMeshes(self.colors, self._layer_cubelets)
+        if self.is_animating_move:
+            draw_calls = self.cube_meshes.draw(self.cube, self.anim_face, self.anim_axis, self._current_animation_angle())
+        else:
+            draw_calls = self.cube_meshes.draw(self.cube)
+        self.profiler.count_draw_calls(draw_calls)
+
     def draw_cube(self):
+        if self.use_mesh_renderer:
+            self._draw_cube_mesh()
+            return
+
         if self.is_animating_move:
             facelet_colors_map = self.anim_color_map
         else:
-            facelet_colors_map = self._generate_facelet_positions_map()
+            facelet_colors_map = self._current_facelet_colors()
         
-        current_angle_degrees = 0.0
-        if self.is_animating_move:
-            prog = max(0.0, min(self.animation_progress, self.ANIMATION_FRAMES))
-            fraction = prog / float(self.ANIMATION_FRAMES)
-            current_angle_degrees = fraction * self.anim_total_angle
+        current_angle_degrees = self._current_animation_angle()
 
+        draw_calls = 0
         cubelet_index = 0
         for x_grid in range(3):
             for y_grid in range(3):
@@ -222,23 +313,31 @@ class RubiksCube3D:
                         pyray.rl_translatef(base_pos.x, base_pos.y, base_pos.z)
 
                     pyray.draw_cube(Vector3(0,0,0), 0.95, 0.95, 0.95, self.colors['NONE'])
+                    draw_calls += 1
                     
                     colors_for_this_cubelet = facelet_colors_map[cubelet_index]
                     
                     if colors_for_this_cubelet['U'] != 'NONE':
                         pyray.draw_cube(Vector3(0, 0.475, 0), 0.9, 0.05, 0.9, self.colors[colors_for_this_cubelet['U']])
+                        draw_calls += 1
                     if colors_for_this_cubelet['D'] != 'NONE':
                         pyray.draw_cube(Vector3(0, -0.475, 0), 0.9, 0.05, 0.9, self.colors[colors_for_this_cubelet['D']])
+                        draw_calls += 1
                     if colors_for_this_cubelet['F'] != 'NONE':
                         pyray.draw_cube(Vector3(0, 0, 0.475), 0.9, 0.9, 0.05, self.colors[colors_for_this_cubelet['F']])
+                        draw_calls += 1
                     if colors_for_this_cubelet['B'] != 'NONE':
                         pyray.draw_cube(Vector3(0, 0, -0.475), 0.9, 0.9, 0.05, self.colors[colors_for_this_cubelet['B']])
+                        draw_calls += 1
                     if colors_for_this_cubelet['L'] != 'NONE':
                         pyray.draw_cube(Vector3(-0.475, 0, 0), 0.05, 0.9, 0.9, self.colors[colors_for_this_cubelet['L']])
+                        draw_calls += 1
                     if colors_for_this_cubelet['R'] != 'NONE':
                         pyray.draw_cube(Vector3(0.475, 0, 0), 0.05, 0.9, 0.9, self.colors[colors_for_this_cubelet['R']])
+                        draw_calls += 1
                     pyray.rl_pop_matrix()
                     cubelet_index += 1
+        self.profiler.count_draw_calls(draw_calls)
 
     def handle_input(self):
         if self.is_coloring_mode:
@@ -267,7 +366,10 @@ class RubiksCube3D:
                     self.start_animation_for_move(self.solution[self.solve_index])
                     self.solve_index += 1
             if pyray.is_key_pressed(KeyboardKey.KEY_A): self.solve_all_moves()
+            if pyray.is_key_pressed(KeyboardKey.KEY_Z): self.undo()
+            if pyray.is_key_pressed(KeyboardKey.KEY_Y): self.redo()
             if pyray.is_key_pressed(KeyboardKey.KEY_I):
+                self._cancel_solve()
                 self.is_coloring_mode = True
                 self.is_solving_all = False
                 self.solution = []
@@ -285,6 +387,8 @@ class RubiksCube3D:
             self.active_color = None
             print("Coloring mode exited. Press 'P' to solve your cube.")
             return
+        if pyray.is_key_pressed(KeyboardKey.KEY_Z): self.undo()
+        if pyray.is_key_pressed(KeyboardKey.KEY_Y): self.redo()
 
         if pyray.is_mouse_button_pressed(pyray.MouseButton.MOUSE_BUTTON_LEFT):
             mouse_pos = pyray.get_mouse_position()
@@ -310,7 +414,7 @@ class RubiksCube3D:
                         
                         if pyray.check_collision_point_rec(mouse_pos, sticker_rect):
                             if self.active_color is not None:
-                                self.cube.faces[face_name][r][c] = self.active_color
+                                self.history.set_sticker(face_name, r, c, self.active_color)
                                 print(f"Sticker {face_name}[{r}][{c}] set to {self.active_color}")
                             self.selected_face = face_name
                             self.selected_row = r
@@ -318,26 +422,60 @@ class RubiksCube3D:
                             return
 
     def scramble(self):
+        self._cancel_solve()
         self.solution = []; self.solve_index = 0; self.is_solving_all = False
         self.current_move_notation = ""
         print("Scrambling...")
-        scramble_seq = self.cube.scramble(20)
+        scramble_seq = self.history.scramble(20)
         print(f"Scrambled: {' '.join(scramble_seq)}. Press 'P' to solve.")
         
+    def undo(self):
+        self._step_history(self.history.undo, "Undid", "Nothing to undo.")
+
+    def redo(self):
+        self._step_history(self.history.redo, "Redid", "Nothing to redo.")
+
+    def _step_history(self, step, verb, empty_message):
+        # A pending or partly played solution no longer matches the cube.
+        self._cancel_solve()
+        self.solution = []; self.solve_index = 0; self.is_solving_all = False
+        self.current_move_notation = ""
+        print(f"{verb} last change." if step() else empty_message)
+
     def reset_cube(self):
-        self.cube.reset(); self.solution = []; self.solve_index = 0; self.is_solving_all = False
+        self._cancel_solve()
+        self.history.reset(); self.solution = []; self.solve_index = 0; self.is_solving_all = False
         self.current_move_notation = ""
         print("Cube reset to solved state. Press 'S' to scramble.")
 
     def start_solve(self):
+        if self.solve_job is not None and self.solve_job.is_pending(): return
         print("Solving...")
         try:
-            self.solution = self.solver.solve(self.cube)
+            facelets = self.solver._build_facelet_string(self.cube)
+        except ValueError as e:
+            print(f"Solver Error: Solver failed: {e}")
+            return
+        self.solve_job = SolveJob(self.solver, facelets, budget=self.solve_budget)
+
+    def _poll_solve_job(self):
+        job = self.solve_job
+        if job is None or job.is_pending(): return
+        self.solve_job = None
+        self.profiler.record_solve(job.elapsed_ms(), job.state)
+        if job.state == SolveJob.FAILED:
+            print(f"Solver Error: {job.error}")
+        elif job.state == SolveJob.COMPLETE:
+            self.solution = simplify_moves(job.solution)
             self.solve_index = 0
             self.current_move_notation = ""
-            if self.solution: print(f"Solution found! {len(self.solution)} moves. Press 'N' for next move or 'A' for animated solve.")
+            if self.solution: print(f"Solution found in {job.elapsed_ms():.0f}ms! {len(self.solution)} moves. Press 'N' for next move or 'A' for animated solve.")
             else: print("Cube is already solved or an error occurred.")
-        except RuntimeError as e: print(f"Solver Error: {e}")
+
+    def _cancel_solve(self):
+        if self.solve_job is not None:
+            self.solve_job.cancel()
+            self.solve_job = None
 
     def solve_all_moves(self):
         if not self.solution:
@@ -349,26 +487,80 @@ class RubiksCube3D:
 
     def run(self):
         while not pyray.window_should_close():
+            self.profiler.begin_frame()
+            self._handle_profiler_keys()
             self.update()
             pyray.begin_drawing()
             pyray.clear_background(pyray.RAYWHITE)
             
             if self.is_coloring_mode:
                 self._draw_coloring_ui()
+                self.profiler.mark('coloring_ui')
             else:
                 pyray.begin_mode_3d(self.camera)
                 self.draw_cube()
                 pyray.draw_grid(10, 1.0)
                 pyray.end_mode_3d()
+                self.profiler.mark('draw_cube')
                 pyray.draw_text("R: Reset, S: Scramble, P: Solve, N: Next Move, A: Solve All", 10, 10, 12, pyray.BLACK)
                 pyray.draw_text("I: Enter/Exit Custom Scramble Mode", 10, 30, 12, pyray.BLACK)
                 if self.current_move_notation:
                     pyray.draw_text(f"Executing move: {self.current_move_notation}", 10, 70, 15, pyray.DARKGRAY)
+                if self.solve_job is not None and self.solve_job.is_pending():
+                    pyray.draw_text(f"Solving... {self.solve_job.elapsed_ms():.0f}ms", 10, 90, 15, pyray.MAROON)
                 if self.camera_is_movable:
                     pyray.draw_text("Arrow keys to rotate and move camera", 10, 50, 12, pyray.BLACK)
 
+            if self.show_profiler:
+                self._draw_profiler_overlay()
+                self.profiler.mark('overlay')
             pyray.end_drawing()
+            self.profiler.mark('present')
+            self.profiler.end_frame()
+        if self.cube_meshes is not None:
+            self.cube_meshes.unload()
         pyray.close_window()
+
+    def _handle_profiler_keys(self):
+        if pyray.is_key_pressed(KeyboardKey.KEY_M):
+            self.use_mesh_renderer = not self.use_mesh_renderer
+            print(f"Rendering with {'a single mesh' if self.use_mesh_renderer else 'immediate-mode cubes'}.")
+        if pyray.is_key_pressed(KeyboardKey.KEY_F3):
+            self.show_profiler = not self.show_profiler
+            self.profiler.enabled = self.show_profiler
+            self.profiler.begin_frame()
+        if pyray.is_key_pressed(KeyboardKey.KEY_F4) and self.profiler.frames:
+            path = self.profiler.dump(f"frame_trace_{time.strftime('%Y%m%d_%H%M%S')}.json")
+            print(f"Frame trace written to {path}")
+
+    def _draw_profiler_overlay(self):
+        x, y = self.screen_width - 250, 10
+        pyray.draw_rectangle(x - 10, y - 5, 255, 215, pyray.fade(pyray.BLACK, 0.75))
+        summary = self.profiler.summary()
+        frame = summary.get('frame')
+        if frame:
+            pyray.draw_text(f"frame p50 {frame['p50_ms']:.2f}ms p95 {frame['p95_ms']:.2f}ms", x, y, 12, pyray.RAYWHITE)
+        y += 16
+        for phase in ('handle_input', 'update', 'draw_cube', 'coloring_ui', 'overlay', 'present'):
+            stats = summary.get(phase)
+            if stats and stats['max_ms'] > 0:
+                pyray.draw_text(f"{phase:12s} {stats['p50_ms']:6.2f} / {stats['p95_ms']:6.2f}ms", x, y, 10, pyray.LIGHTGRAY)
+                y += 13
+        calls = summary.get('draw_calls')
+        if calls:
+            pyray.draw_text(f"draw calls/frame {calls['mean']:.0f} (max {calls['max']})", x, y, 10, pyray.LIGHTGRAY)
+            y += 13
+        solves = self.profiler.solves()
+        if solves:
+            pyray.draw_text(f"last solve {solves[-1][1]:.0f}ms ({solves[-1][2]})", x, y, 10, pyray.LIGHTGRAY)
+            y += 13
+        counts, top = self.profiler.histogram('frame', bins=20)
+        peak = max(counts) or 1
+        base_y = y + 50
+        for i, n in enumerate(counts):
+            h = int(45 * n / peak)
+            pyray.draw_rectangle(x + i * 11, base_y - h, 9, h, pyray.SKYBLUE)
+        pyray.draw_text(f"0 - {top:.1f}ms   F3 hide, F4 dump", x, base_y + 4, 10, pyray.RAYWHITE)
     
     def _draw_coloring_ui(self):
         pyray.draw_rectangle(0, 0, self.screen_width, self.screen_height, pyray.fade(pyray.BLACK, 0.7))
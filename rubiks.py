@@ -0,0 +1,222 @@
+import argparse
+import json
+import os
+import signal
+import sys
+import time
+from collections import deque
+from cube import Cube
+from solver import solve_many
+
+
+def parse_line(line):
+    text = line.strip()
+    if not text:
+        raise ValueError("blank line")
+    if len(text) == 54 and ' ' not in text:
+        if text[4::9] == 'URFDLB' and set(text) <= set('URFDLB'):
+            return text
+        return Cube.from_string(text)
+    cube = Cube()
+    cube.execute_moves(text)
+    return cube
+
+
+def _parsed(lines):
+    for line in lines:
+        try:
+            yield parse_line(line)
+        except (ValueError, UnicodeEncodeError) as e:
+            yield ValueError(f"Could not parse input line: {e}")
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+class _Throughput:
+    def __init__(self, stream, interval, window=10000):
+        self.stream = stream
+        self.interval = interval
+        self.items = 0
+        self.errors = 0
+        self.started = time.perf_counter()
+        self._latencies = deque(maxlen=window)
+        self._window_items = 0
+        self._window_started = self.started
+
+    def record(self, result):
+        self.items += 1
+        self._window_items += 1
+        if result.error is not None:
+            self.errors += 1
+        else:
+            self._latencies.append(result.seconds)
+        if self.interval and time.perf_counter() - self._window_started >= self.interval:
+            self.report()
+
+    def report(self):
+        now = time.perf_counter()
+        elapsed = max(now - self._window_started, 1e-9)
+        latencies = sorted(self._latencies)
+        self.stream.write(
+            f"[rubiks] {self.items} items, {self._window_items / elapsed:.1f} items/s, "
+            f"p50 {_percentile(latencies, 0.50) * 1000:.1f}ms, p99 {_percentile(latencies, 0.99) * 1000:.1f}ms, "
+            f"{self.errors} errors\n"
+        )
+        self.stream.flush()
+        self._latencies.clear()
+        self._window_items = 0
+        self._window_started = now
+
+
+def _result_record(result, line_number):
+    return {
+        'line': line_number,
+        'facelets': result.facelets,
+        'solution': ' '.join(result.solution) if result.solution is not None else None,
+        'length': len(result.solution) if result.solution is not None else None,
+        'error': result.error,
+    }
+
+
+def run_solve(args):
+    source = sys.stdin if args.input == '-' else open(args.input, 'r')
+    out = sys.stdout
+    stats = _Throughput(sys.stderr, args.progress_interval)
+    if args.server is not None:
+        from solver_server import SolverClient
+        results = SolverClient(args.server or None).solve_many(_parsed(source), chunk_size=args.chunk_size)
+    else:
+        results = solve_many(_parsed(source), workers=args.workers, chunk_size=args.chunk_size,
+                             ordered=args.ordered, cache_path=args.cache)
+
+    def emit(result):
+        out.write(json.dumps(_result_record(result, result.index + 1)) + '\n')
+        stats.record(result)
+
+    try:
+        for result in results:
+            emit(result)
+        out.flush()
+    except BrokenPipeError:
+        # The reader went away (e.g. `| head`): stop solving and exit quietly,
+        # pointing stdout at devnull so the final flush at exit cannot fail.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), out.fileno())
+        return 1
+    finally:
+        results.close()
+        if source is not sys.stdin:
+            source.close()
+    if args.progress_interval:
+        stats.report()
+    return 1 if stats.errors and args.fail_on_error else 0
+
+
+def run_scramble(args):
+    import numpy as np
+    from scrambler import iter_random_facelets, scramble_sequences
+    rng = np.random.default_rng(args.seed)
+    out = sys.stdout
+    states = iter_random_facelets(args.count, batch_size=args.batch_size, rng=rng)
+    if not args.moves:
+        for facelets in states:
+            out.write(facelets + '\n')
+    else:
+        for facelets, moves in scramble_sequences(states, workers=args.workers, chunk_size=args.chunk_size):
+            out.write(json.dumps({'facelets': facelets, 'scramble': ' '.join(moves)}) + '\n')
+    out.flush()
+    return 0
+
+
+def run_serve(args):
+    from solver_server import SolverServer
+    server = SolverServer(args.address, workers=args.workers, batch_size=args.batch_size,
+                          max_delay=args.max_delay_ms / 1000.0, cache_path=args.cache)
+    try:
+        server.start()
+    except OSError as e:
+        print(f"Cannot start solver server: {e}", file=sys.stderr)
+        return 1
+    sys.stderr.write(f"[solver-server] listening on {server.address} with {server.workers} worker(s)\n")
+    # Exit through serve_forever's cleanup (closing the socket) on SIGTERM too.
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        server.serve_forever(report_interval=args.progress_interval)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def run_metrics(args):
+    from solver_server import SolverClient
+    client = SolverClient(args.address, fallback=False)
+    try:
+        print(json.dumps(client.metrics(), indent=2))
+    except (OSError, ValueError) as e:
+        print(f"No solver server at {client.address}: {e}", file=sys.stderr)
+        return 1
+    finally:
+        client.close()
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m rubiks', description="Headless Rubik's Cube tools.")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    solve = sub.add_parser('solve', help="Solve facelet strings or move sequences, one per line, into JSONL.")
+    solve.add_argument('input', nargs='?', default='-', help="Input file, or '-' for stdin (default).")
+    solve.add_argument('--workers', type=int, default=1, help="Solver processes (default 1, in-process).")
+    solve.add_argument('--chunk-size', type=int, default=64, help="Lines sent to a worker at a time.")
+    order = solve.add_mutually_exclusive_group()
+    order.add_argument('--ordered', dest='ordered', action='store_true', default=True,
+                       help="Emit results in input order (default).")
+    order.add_argument('--unordered', dest='ordered', action='store_false',
+                       help="Emit results as soon as they are solved.")
+    solve.add_argument('--progress-interval', type=float, default=5.0,
+                       help="Seconds between stderr throughput lines, 0 to disable.")
+    solve.add_argument('--fail-on-error', action='store_true', help="Exit with status 1 if any line failed.")
+    solve.add_argument('--server', nargs='?', const='', default=None, metavar='ADDRESS',
+                       help="Solve on a running solver server (default address if none given).")
+    solve.add_argument('--cache', default=None, metavar='PATH',
+                       help="SQLite solution cache shared across runs (ignored with --server).")
+
+    serve = sub.add_parser('serve', help="Run a solver server that keeps kociemba's tables warm.")
+    serve.add_argument('--address', default=None,
+                       help="Unix socket path or host:port (default $RUBIKS_SOLVER_ADDRESS or a temp socket).")
+    serve.add_argument('--workers', type=int, default=None, help="Solver processes (default: CPU count).")
+    serve.add_argument('--batch-size', type=int, default=32, help="Most requests sent to a worker at once.")
+    serve.add_argument('--max-delay-ms', type=float, default=2.0,
+                       help="How long to wait for more requests before sending a partial batch.")
+    serve.add_argument('--progress-interval', type=float, default=0,
+                       help="Seconds between stderr metrics lines, 0 to disable (default).")
+    serve.add_argument('--cache', default=None, metavar='PATH', help="SQLite solution cache shared by the workers.")
+
+    metrics = sub.add_parser('metrics', help="Print a running solver server's metrics as JSON.")
+    metrics.add_argument('--address', default=None, help="Server address (default as for serve).")
+
+    scramble = sub.add_parser('scramble', help="Write uniformly random cube states as facelet strings.")
+    scramble.add_argument('count', type=int, help="Number of states to generate.")
+    scramble.add_argument('--seed', type=int, default=None, help="Random seed for reproducible output.")
+    scramble.add_argument('--batch-size', type=int, default=100000, help="States generated per numpy batch.")
+    scramble.add_argument('--moves', action='store_true',
+                          help="Also solve each state and emit JSONL with a scramble sequence reaching it.")
+    scramble.add_argument('--workers', type=int, default=1, help="Solver processes used with --moves.")
+    scramble.add_argument('--chunk-size', type=int, default=64, help="States sent to a worker at a time.")
+
+    args = parser.parse_args(argv)
+    if args.command == 'solve':
+        return run_solve(args)
+    if args.command == 'scramble':
+        return run_scramble(args)
+    if args.command == 'serve':
+        return run_serve(args)
+    if args.command == 'metrics':
+        return run_metrics(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,76 @@
+import numpy as np
+from cube import CORNER_FACELETS, CORNER_NAMES, EDGE_FACELETS, EDGE_NAMES, invert_moves
+
+
+_CORNER_SLOTS = np.array(CORNER_FACELETS, dtype=np.intp)
+_EDGE_SLOTS = np.array(EDGE_FACELETS, dtype=np.intp)
+_CORNER_COLORS = np.frombuffer(''.join(CORNER_NAMES).encode('ascii'), dtype=np.uint8).reshape(8, 3)
+_EDGE_COLORS = np.frombuffer(''.join(EDGE_NAMES).encode('ascii'), dtype=np.uint8).reshape(12, 2)
+_CENTER_INDICES = np.array([4, 13, 22, 31, 40, 49], dtype=np.intp)
+_FACE_LETTERS = np.frombuffer(b'URFDLB', dtype=np.uint8)
+
+
+def permutation_parity(perms):
+    # Inversion count mod 2 of every row.
+    n = perms.shape[1]
+    upper = np.triu(np.ones((n, n), dtype=bool), k=1)
+    return ((perms[:, :, None] > perms[:, None, :]) & upper).sum(axis=(1, 2)) & 1
+
+
+def random_cubies(count, rng=None):
+    # Uniformly distributed solvable states as (cp, co, ep, eo) arrays, one row
+    # per cube. Permutations are drawn freely and made even together by
+    # swapping the first two edges, which keeps the distribution uniform;
+    # the last twist and flip are fixed by the orientation sums.
+    rng = np.random.default_rng() if rng is None else rng
+    cp = rng.permuted(np.tile(np.arange(8, dtype=np.int8), (count, 1)), axis=1)
+    ep = rng.permuted(np.tile(np.arange(12, dtype=np.int8), (count, 1)), axis=1)
+    odd = (permutation_parity(cp) != permutation_parity(ep)).nonzero()[0]
+    ep[odd, 0], ep[odd, 1] = ep[odd, 1], ep[odd, 0]
+
+    co = rng.integers(0, 3, size=(count, 8), dtype=np.int8)
+    co[:, 7] = (-co[:, :7].sum(axis=1)) % 3
+    eo = rng.integers(0, 2, size=(count, 12), dtype=np.int8)
+    eo[:, 11] = eo[:, :11].sum(axis=1) & 1
+    return cp, co, ep, eo
+
+
+def cubies_to_facelet_array(cp, co, ep, eo):
+    # Vectorized CubieCube.to_facelets: an (N, 54) array of URFDLB letters.
+    count = cp.shape[0]
+    out = np.empty((count, 54), dtype=np.uint8)
+    out[:, _CENTER_INDICES] = _FACE_LETTERS
+    rows = np.arange(count)[:, None]
+    for n in range(3):
+        out[rows, _CORNER_SLOTS[np.arange(8), (n + co) % 3]] = _CORNER_COLORS[cp, n]
+    for n in range(2):
+        out[rows, _EDGE_SLOTS[np.arange(12), n ^ eo]] = _EDGE_COLORS[ep, n]
+    return out
+
+
+def random_facelet_array(count, rng=None):
+    return cubies_to_facelet_array(*random_cubies(count, rng))
+
+
+def random_facelets(count, rng=None):
+    data = random_facelet_array(count, rng).tobytes()
+    return [data[i:i + 54].decode('ascii') for i in range(0, len(data), 54)]
+
+
+def iter_random_facelets(total, batch_size=100000, rng=None):
+    rng = np.random.default_rng() if rng is None else rng
+    produced = 0
+    while produced < total:
+        count = min(batch_size, total - produced)
+        yield from random_facelets(count, rng)
+        produced += count
+
+
+def scramble_sequences(facelets, workers=1, chunk_size=64):
+    # Yields (facelets, moves) pairs where `moves` takes a solved cube to the
+    # state: the inverse of a Kociemba solution. Results come back in input order.
+    from solver import solve_many
+    for result in solve_many(facelets, workers=workers, chunk_size=chunk_size, ordered=True):
+        if result.error is not None:
+            raise RuntimeError(result.error)
+        yield result.facelets, invert_moves(result.solution)
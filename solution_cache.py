@@ -0,0 +1,86 @@
+import sqlite3
+import threading
+from collections import OrderedDict
+from symmetry import canonicalize
+
+
+class SolutionCache:
+    def __init__(self, maxsize=100000, path=None):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_hits = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path is not None:
+            # Autocommit, so every put is on disk without a close() or flush().
+            # WAL with synchronous=NORMAL keeps those commits cheap and lets
+            # several solver processes share one file.
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30.0)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS solutions (key TEXT PRIMARY KEY, solution TEXT NOT NULL)")
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            solution = self._entries.get(key)
+            if solution is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return solution
+            if self._db is not None:
+                row = self._db.execute("SELECT solution FROM solutions WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    solution = tuple(row[0].split())
+                    self._remember(key, solution)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return solution
+            self.misses += 1
+            return None
+
+    def put(self, key, solution):
+        solution = tuple(solution)
+        with self._lock:
+            self._remember(key, solution)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO solutions (key, solution) VALUES (?, ?)",
+                                 (key, ' '.join(solution)))
+
+    def lookup(self, facelets, solve_func):
+        key, sym = canonicalize(facelets)
+        solution = self.get(key)
+        if solution is None:
+            solution = solve_func(key)
+            self.put(key, solution)
+        return sym.map_solution_back(solution)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries), 'maxsize': self.maxsize,
+                'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'disk_hits': self.disk_hits
+            }
+
+    def flush(self):
+        # Writes are committed as they happen; kept for callers that flush.
+        pass
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _remember(self, key, solution):
+        self._entries[key] = solution
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
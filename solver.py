@@ -1,10 +1,31 @@
-from collections import Counter
-import kociemba
+import os
+import queue
+import sys
+import threading
+import time
+from collections import namedtuple
+from itertools import islice
+from operator import attrgetter
+from cube import simplify_moves
+from validation import check_facelets
+
+
+SolveResult = namedtuple('SolveResult', ['index', 'facelets', 'solution', 'error', 'seconds'])
+# `depth` is the max_depth of the search that found `solution` (24 for the
+# first, unbounded one); `seconds` is when it was found, `elapsed` the total
+# wall time. `searches` holds (max_depth, length or None, seconds) per search.
+PortfolioResult = namedtuple('PortfolioResult', ['solution', 'depth', 'seconds', 'elapsed', 'searches'])
+
+_DEFAULT_MAX_DEPTH = 24
+# How often a portfolio race checks its stop event while waiting for results.
+_STOP_POLL_SECONDS = 0.05
 
 
 class KociembaSolver:
-    def __init__(self):
-        pass
+    def __init__(self, cache=None, table_dir=None):
+        self.cache = cache
+        self.table_dir = table_dir
+        self._optimal = None
 
     def _build_facelet_string(self, cube):
         centers = {f: cube.faces[f][1][1] for f in cube.faces}
@@ -23,19 +44,347 @@ class KociembaSolver:
         return ''.join(facelets)
 
     def _validate_facelet_string(self, facelets):
-        if len(facelets) != 54:
-            raise ValueError(f"Facelet string wrong length: {len(facelets)} (expected 54).")
-        cnt = Counter(facelets)
-        required = {ch: 9 for ch in "URFDLB"}
-        if any(cnt[ch] != required[ch] for ch in required):
-            raise ValueError(f"Facelet counts incorrect: {cnt}")
-        return True
-
-    def solve(self, cube):
+        # Rejects unsolvable states (twisted corners, flipped edges, swapped
+        # pieces) before they reach kociemba.
+        return check_facelets(facelets)
+
+    def solve(self, cube, optimal=False):
         try:
             facelets = self._build_facelet_string(cube)
+        except Exception as e:
+            raise RuntimeError(f"Solver failed: {e}")
+        return self.solve_facelets(facelets, optimal=optimal)
+
+    def solve_facelets(self, facelets, optimal=False):
+        try:
             self._validate_facelet_string(facelets)
-            solution_str = kociemba.solve(facelets)
-            return solution_str.strip().split()
+            if optimal:
+                return self.optimal_solver().solve_facelets(facelets)
+            if self.cache is not None:
+                return simplify_moves(self.cache.lookup(facelets, self._run_kociemba))
+            return simplify_moves(self._run_kociemba(facelets))
         except Exception as e:
             raise RuntimeError(f"Solver failed: {e}")
+
+    def optimal_solver(self):
+        if self._optimal is None:
+            from optimal import TABLE_DIR, OptimalSolver
+            self._optimal = OptimalSolver(self.table_dir or TABLE_DIR)
+        return self._optimal
+
+    def _run_kociemba(self, facelets, max_depth=_DEFAULT_MAX_DEPTH):
+        # Imported on first use: loading kociemba and its tables is the slow
+        # part of starting a worker.
+        import kociemba
+        return kociemba.solve(facelets, max_depth=max_depth).strip().split()
+
+    def solve_within(self, facelets, budget=1.0, target_length=None, workers=None, stop=None):
+        # Solves once as usual, then races kociemba searches with ever smaller
+        # max_depth in separate processes until one reaches target_length,
+        # `budget` seconds have passed or the `stop` event (threading.Event) is
+        # set, and returns the shortest solution as a PortfolioResult. Searches
+        # still running then are killed.
+        import multiprocessing
+        began = time.perf_counter()
+        deadline = began + budget
+        try:
+            self._validate_facelet_string(facelets)
+            best = self._run_kociemba(facelets)
+        except Exception as e:
+            raise RuntimeError(f"Solver failed: {e}")
+        best_depth, found_at = _DEFAULT_MAX_DEPTH, time.perf_counter() - began
+        searches = [(_DEFAULT_MAX_DEPTH, len(best), found_at)]
+        floor = max(target_length or 1, 1)
+        workers = workers or os.cpu_count() or 1
+
+        ctx = multiprocessing.get_context(_search_start_method())
+        results = ctx.Queue()
+        running = {}
+        next_depth = len(best) - 1
+        try:
+            while len(best) > floor:
+                while len(running) < workers and next_depth >= floor:
+                    process = ctx.Process(target=_depth_search, args=(facelets, next_depth, results), daemon=True)
+                    try:
+                        process.start()
+                    except OSError:
+                        # Out of processes or memory: race with the searches
+                        # already running and keep the best found so far.
+                        workers = len(running)
+                        break
+                    running[next_depth] = process
+                    next_depth -= 1
+                remaining = deadline - time.perf_counter()
+                if not running or remaining <= 0 or (stop is not None and stop.is_set()):
+                    break
+                try:
+                    depth, solution, seconds = results.get(timeout=min(remaining, _STOP_POLL_SECONDS))
+                except queue.Empty:
+                    continue
+                process = running.pop(depth, None)
+                if process is not None:
+                    process.join()
+                searches.append((depth, len(solution) if solution is not None else None, seconds))
+                if solution is None:
+                    # No solution within `depth`: shallower searches cannot succeed either.
+                    floor = depth + 1
+                    next_depth = min(next_depth, depth)
+                elif len(solution) < len(best):
+                    best, best_depth, found_at = solution, depth, time.perf_counter() - began
+                    next_depth = min(next_depth, len(best) - 1)
+                # Searches at or above the best length can no longer win.
+                for d in [d for d in running if d >= len(best) or d < floor]:
+                    running.pop(d).terminate()
+        finally:
+            for process in running.values():
+                process.terminate()
+            for process in running.values():
+                process.join()
+            results.close()
+        return PortfolioResult(simplify_moves(best), best_depth, found_at, time.perf_counter() - began, searches)
+
+
+def _search_start_method():
+    # Forked children inherit the tables loaded by the first solve, but fork
+    # is only safe on Linux: on macOS forking a process that holds a GUI or
+    # OpenGL context (the renderer solves from a background thread) can crash
+    # the child. Elsewhere each search loads the tables itself.
+    import multiprocessing
+    methods = multiprocessing.get_all_start_methods()
+    if sys.platform.startswith('linux') and 'fork' in methods:
+        return 'fork'
+    return 'forkserver' if 'forkserver' in methods else 'spawn'
+
+
+def _depth_search(facelets, max_depth, results):
+    began = time.perf_counter()
+    try:
+        solution = KociembaSolver()._run_kociemba(facelets, max_depth)
+    except ValueError:
+        solution = None
+    results.put((max_depth, solution, time.perf_counter() - began))
+
+
+class SolveJob:
+    PENDING = 'pending'
+    COMPLETE = 'complete'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+
+    def __init__(self, solver, facelets, budget=None):
+        # With a budget (seconds), spends it looking for a shorter solution.
+        self.facelets = facelets
+        self.budget = budget
+        self.state = self.PENDING
+        self.solution = None
+        self.error = None
+        self.started = time.perf_counter()
+        self.finished = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(solver,), daemon=True)
+        self._thread.start()
+
+    def _run(self, solver):
+        try:
+            if self.budget:
+                solution, error = solver.solve_within(self.facelets, self.budget, stop=self._stop).solution, None
+            else:
+                solution, error = solver.solve_facelets(self.facelets), None
+        except Exception as e:
+            # Anything uncaught here would leave the job pending forever.
+            solution, error = None, e
+        with self._lock:
+            if self.state != self.PENDING:
+                return
+            self.solution, self.error = solution, error
+            self.state = self.FAILED if error is not None else self.COMPLETE
+            self.finished = time.perf_counter()
+
+    def cancel(self):
+        # Also stops a running portfolio race, which kills its searches.
+        self._stop.set()
+        with self._lock:
+            if self.state == self.PENDING:
+                self.state = self.CANCELLED
+                self.finished = time.perf_counter()
+
+    def is_pending(self):
+        return self.state == self.PENDING
+
+    def elapsed_ms(self):
+        end = self.finished if self.finished is not None else time.perf_counter()
+        return (end - self.started) * 1000.0
+
+
+_worker_solver = None
+
+
+def init_worker(cache_path=None):
+    # Sets up this process's solve_chunk solver, with a SolutionCache stored
+    # at cache_path if one is given.
+    global _worker_solver
+    _worker_solver = KociembaSolver(cache=_open_cache(cache_path))
+
+
+def _open_cache(cache_path):
+    if cache_path is None:
+        return None
+    from solution_cache import SolutionCache
+    return SolutionCache(path=cache_path)
+
+
+def solve_chunk(chunk, solver=None):
+    # Solves (index, facelets) pairs with one solver per process unless one
+    # is given; failures become SolveResults with an error instead of raising.
+    if solver is None:
+        if _worker_solver is None:
+            init_worker()
+        solver = _worker_solver
+    results = []
+    for index, facelets in chunk:
+        began = time.perf_counter()
+        try:
+            solution, error = solver.solve_facelets(facelets), None
+        except RuntimeError as e:
+            solution, error = None, str(e)
+        results.append(SolveResult(index, facelets, solution, error, time.perf_counter() - began))
+    return results
+
+
+def to_facelets(item, solver):
+    # Facelet string for a facelet string, Cube or faces dict. Callers that parse their own input can pass the parse error as the item.
+    if isinstance(item, Exception):
+        raise item
+    if isinstance(item, str):
+        return item
+    if isinstance(item, dict):
+        from cube import Cube
+        cube = Cube()
+        cube.set_state(item)
+        item = cube
+    return solver._build_facelet_string(item)
+
+
+def solve_many(items, workers=None, chunk_size=64, max_pending=None, ordered=False, cache_path=None):
+    # Yields a SolveResult per item. With ordered=True results come in input
+    # order and at most max_pending chunks are in flight or waiting behind a
+    # slow one; otherwise each chunk's results come as soon as it is solved.
+    # With cache_path every worker shares a SolutionCache stored there.
+    from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+    from concurrent.futures.process import BrokenProcessPool
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or workers * 4
+    solver = KociembaSolver()
+    enumerated = enumerate(items)
+
+    def next_chunk():
+        chunk, failed = [], []
+        for index, item in islice(enumerated, chunk_size):
+            try:
+                chunk.append((index, to_facelets(item, solver)))
+            except Exception as e:
+                failed.append(SolveResult(index, None, None, f"Solver failed: {e}", 0.0))
+        return chunk, failed
+
+    if workers == 1:
+        local = KociembaSolver(cache=_open_cache(cache_path))
+        while True:
+            chunk, failed = next_chunk()
+            if not chunk and not failed:
+                return
+            yield from sorted(failed + solve_chunk(chunk, local), key=attrgetter('index'))
+
+    def new_pool():
+        return ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(cache_path,))
+
+    def finish(entry, results):
+        future = Future()
+        future.set_result(results)
+        entry.future = future
+
+    def submit(entry):
+        try:
+            entry.future = pool.submit(solve_chunk, entry.chunk)
+        except BrokenProcessPool:
+            recover()
+
+    def recover():
+        # A worker died and took the pool down with it. Chunks that had not
+        # finished are retried one at a time in a new pool, so one that kills
+        # its worker again is caught alone and reported as failed.
+        nonlocal pool
+        pool.shutdown(wait=False, cancel_futures=True)
+        pool = new_pool()
+        for entry in pending:
+            future = entry.future
+            if future is not None and future.done() and not isinstance(future.exception(), BrokenProcessPool):
+                continue
+            if entry.retry and future is not None:
+                finish(entry, [SolveResult(index, facelets, None, "Solver failed: worker process died", 0.0)
+                               for index, facelets in entry.chunk])
+            else:
+                entry.retry, entry.future = True, None
+
+    pool = new_pool()
+    # In submission order, so the first entry is the oldest chunk.
+    pending = []
+    exhausted = False
+    try:
+        while True:
+            retrying = [e for e in pending if e.retry and (e.future is None or not e.future.done())]
+            if retrying:
+                if all(e.future is None for e in retrying):
+                    submit(retrying[0])
+                    continue
+            else:
+                while not exhausted and len(pending) < max_pending:
+                    chunk, failed = next_chunk()
+                    if not chunk and not failed:
+                        exhausted = True
+                        break
+                    entry = _PendingChunk(chunk, failed)
+                    pending.append(entry)
+                    if chunk:
+                        submit(entry)
+                        if entry.future is None:
+                            break
+                    else:
+                        finish(entry, [])
+                if any(e.future is None for e in pending):
+                    continue
+            if not pending:
+                return
+            if ordered:
+                done = [pending[0]]
+                wait([pending[0].future])
+            else:
+                ready, _ = wait([e.future for e in pending if e.future is not None], return_when=FIRST_COMPLETED)
+                done = [e for e in pending if e.future in ready]
+            for entry in done:
+                try:
+                    results = entry.future.result()
+                except BrokenProcessPool:
+                    recover()
+                    break
+                except Exception as e:
+                    results = [SolveResult(index, facelets, None, f"Solver failed: {e}", 0.0)
+                               for index, facelets in entry.chunk]
+                pending.remove(entry)
+                yield from sorted(entry.failed + results, key=attrgetter('index'))
+    finally:
+        # Also runs when the caller stops iterating early: drop queued chunks
+        # instead of solving them all before returning.
+        pool.shutdown(cancel_futures=True)
+
+
+class _PendingChunk:
+    # A chunk in flight in solve_many. `future` is None while it waits to be
+    # retried after the pool broke; `failed` holds its items that did not parse.
+    __slots__ = ('future', 'chunk', 'failed', 'retry')
+
+    def __init__(self, chunk, failed):
+        self.future = None
+        self.chunk = chunk
+        self.failed = failed
+        self.retry = False
@@ -0,0 +1,431 @@
+import json
+import os
+import queue
+import socket
+import socketserver
+import stat
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from operator import attrgetter
+from solver import KociembaSolver, SolveResult, init_worker, solve_chunk, to_facelets
+from validation import validate_facelets
+
+
+# A Unix socket path, or "host:port" for TCP (the default where AF_UNIX is missing).
+if hasattr(socket, 'AF_UNIX'):
+    DEFAULT_ADDRESS = os.path.join(tempfile.gettempdir(), 'rubiks-solver.sock')
+else:
+    DEFAULT_ADDRESS = '127.0.0.1:7788'
+
+
+def _resolve_address(address):
+    address = address or os.environ.get('RUBIKS_SOLVER_ADDRESS') or DEFAULT_ADDRESS
+    host, sep, port = address.rpartition(':')
+    if sep and port.isdigit() and os.sep not in address:
+        return socket.AF_INET, (host or '127.0.0.1', int(port))
+    if not hasattr(socket, 'AF_UNIX'):
+        raise ValueError(f"Unix sockets are not available here; use host:port instead of {address}")
+    return socket.AF_UNIX, address
+
+
+def _claim_unix_address(path):
+    # Removes a stale socket left by a server that died, but refuses to take
+    # over a live server's address or to delete anything that is not a socket.
+    try:
+        mode = os.stat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise FileExistsError(f"{path} exists and is not a socket")
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    probe.settimeout(1.0)
+    try:
+        probe.connect(path)
+    except OSError:
+        os.unlink(path)
+        return
+    finally:
+        probe.close()
+    raise OSError(f"a solver server is already listening on {path}")
+
+
+def _warm_worker(cache_path=None):
+    # Loads kociemba's tables before the first real request reaches this worker.
+    from cube import Cube
+    init_worker(cache_path)
+    cube = Cube()
+    cube.execute_moves("R U F' L2 D B'")
+    solve_chunk([(0, KociembaSolver()._build_facelet_string(cube))])
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+class _Request:
+    __slots__ = ('connection', 'id', 'facelets', 'received')
+
+    def __init__(self, connection, request_id, facelets):
+        self.connection = connection
+        self.id = request_id
+        self.facelets = facelets
+        self.received = time.perf_counter()
+
+
+class _Connection:
+    # Serializes replies on one socket and lets the handler wait for
+    # outstanding requests before the socket is closed.
+    def __init__(self, wfile):
+        self.wfile = wfile
+        self.pending = 0
+        self._cond = threading.Condition()
+
+    def added(self):
+        with self._cond:
+            self.pending += 1
+
+    def reply(self, message, finished=False):
+        with self._cond:
+            try:
+                self.wfile.write((json.dumps(message) + '\n').encode('utf-8'))
+                self.wfile.flush()
+            except OSError:
+                pass
+            if finished:
+                self.pending -= 1
+                self._cond.notify_all()
+
+    def drain(self):
+        with self._cond:
+            self._cond.wait_for(lambda: self.pending == 0)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        connection = _Connection(self.wfile)
+        try:
+            for line in self.rfile:
+                if line.strip():
+                    self.server.solver_server.handle_line(connection, line)
+        finally:
+            connection.drain()
+
+
+if hasattr(socketserver, 'UnixStreamServer'):
+    class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SolverServer:
+    def __init__(self, address=None, workers=None, batch_size=32, max_delay=0.002, window=10000,
+                 cache_path=None):
+        self.family, self.address = _resolve_address(address)
+        self.cache_path = cache_path
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.started = time.time()
+        self.requests = 0
+        self.completed = 0
+        self.errors = 0
+        self.rejected = 0
+        self.batches = 0
+        self.in_flight = 0
+        self._latencies = deque(maxlen=window)
+        self._completions = deque(maxlen=window)
+        self._queue = queue.Queue()
+        self._slots = threading.Semaphore(self.workers * 2)
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._pool = None
+        self._server = None
+        self._bound = None
+
+    def handle_line(self, connection, line):
+        try:
+            message = json.loads(line)
+            op = message.get('op', 'solve')
+        except (ValueError, AttributeError) as e:
+            connection.reply({'id': None, 'error': f"Bad request: {e}"})
+            return
+        request_id = message.get('id')
+        if op == 'ping':
+            connection.reply({'id': request_id, 'ok': True})
+        elif op == 'metrics':
+            connection.reply({'id': request_id, 'metrics': self.metrics()})
+        elif op == 'solve':
+            facelets = message.get('facelets')
+            checked = validate_facelets(facelets) if isinstance(facelets, str) else None
+            with self._lock:
+                self.requests += 1
+                if checked is None or not checked.ok:
+                    self.rejected += 1
+            if checked is None or not checked.ok:
+                reason = checked.message if checked is not None else "facelets must be a string"
+                connection.reply({'id': request_id, 'error': f"Solver failed: {reason}",
+                                  'reason': checked.reason if checked is not None else None})
+                return
+            connection.added()
+            self._queue.put(_Request(connection, request_id, facelets))
+        else:
+            connection.reply({'id': request_id, 'error': f"Unknown op: {op}"})
+
+    def _batcher(self):
+        # Waits for one request, then collects more until the batch is full or
+        # max_delay has passed, and hands the batch to a worker.
+        while not self._stopping.is_set():
+            try:
+                first = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            batch = [first]
+            deadline = time.perf_counter() + self.max_delay
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._slots.acquire()
+            with self._lock:
+                self.batches += 1
+                self.in_flight += len(batch)
+            try:
+                future = self._pool.submit(solve_chunk, [(i, r.facelets) for i, r in enumerate(batch)])
+            except RuntimeError as e:
+                # The pool is shutting down or a worker died.
+                future = Future()
+                future.set_exception(e)
+            future.add_done_callback(lambda f, batch=batch: self._finish(batch, f))
+
+    def _finish(self, batch, future):
+        self._slots.release()
+        try:
+            results = future.result()
+        except Exception as e:
+            results = [SolveResult(i, r.facelets, None, f"Solver failed: {e}", 0.0) for i, r in enumerate(batch)]
+        now = time.perf_counter()
+        with self._lock:
+            self.in_flight -= len(batch)
+            for result in results:
+                self.completed += 1
+                if result.error is not None:
+                    self.errors += 1
+                self._latencies.append(now - batch[result.index].received)
+                self._completions.append(now)
+        for result in results:
+            request = batch[result.index]
+            if result.error is not None:
+                reply = {'id': request.id, 'error': result.error}
+            else:
+                reply = {'id': request.id, 'solution': result.solution, 'seconds': result.seconds}
+            request.connection.reply(reply, finished=True)
+
+    def metrics(self):
+        now = time.perf_counter()
+        with self._lock:
+            latencies = sorted(self._latencies)
+            recent = [t for t in self._completions if now - t <= 10.0]
+            return {
+                'uptime_s': time.time() - self.started,
+                'workers': self.workers,
+                'requests': self.requests,
+                'completed': self.completed,
+                'errors': self.errors,
+                'rejected': self.rejected,
+                'queue_depth': self._queue.qsize(),
+                'in_flight': self.in_flight,
+                'batches': self.batches,
+                'mean_batch_size': self.completed / self.batches if self.batches else 0.0,
+                'throughput_per_s': len(recent) / 10.0,
+                'latency_ms': {
+                    'p50': _percentile(latencies, 0.50) * 1000.0,
+                    'p95': _percentile(latencies, 0.95) * 1000.0,
+                    'p99': _percentile(latencies, 0.99) * 1000.0,
+                },
+            }
+
+    def start(self):
+        from concurrent.futures import ProcessPoolExecutor
+        if self.family == socket.AF_UNIX:
+            _claim_unix_address(self.address)
+            self._server = _UnixServer(self.address, _Handler)
+            # Remembered so close() only removes the socket this server bound.
+            st = os.stat(self.address)
+            self._bound = (st.st_dev, st.st_ino)
+        else:
+            self._server = _TCPServer(self.address, _Handler)
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker,
+                                         initargs=(self.cache_path,))
+        self._server.solver_server = self
+        threading.Thread(target=self._batcher, daemon=True).start()
+        return self
+
+    def serve_forever(self, report_interval=0):
+        if report_interval:
+            threading.Thread(target=self._report, args=(report_interval,), daemon=True).start()
+        try:
+            self._server.serve_forever()
+        finally:
+            self.close()
+
+    def _report(self, interval):
+        while not self._stopping.wait(interval):
+            m = self.metrics()
+            sys.stderr.write(
+                f"[solver-server] {m['completed']} solved, {m['throughput_per_s']:.1f}/s, "
+                f"queue {m['queue_depth']}, in flight {m['in_flight']}, "
+                f"p50 {m['latency_ms']['p50']:.1f}ms, p99 {m['latency_ms']['p99']:.1f}ms\n"
+            )
+            sys.stderr.flush()
+
+    def shutdown(self):
+        if self._server is not None:
+            self._server.shutdown()
+
+    def close(self):
+        self._stopping.set()
+        if self._server is not None:
+            self._server.server_close()
+            if self._bound is not None:
+                try:
+                    st = os.stat(self.address)
+                    if (st.st_dev, st.st_ino) == self._bound:
+                        os.unlink(self.address)
+                except FileNotFoundError:
+                    pass
+                self._bound = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+class SolverClient(KociembaSolver):
+    # Same API as KociembaSolver, solving on a running SolverServer. With
+    # fallback=True a lost connection quietly falls back to solving locally.
+    def __init__(self, address=None, timeout=60.0, fallback=True):
+        super().__init__()
+        self.family, self.address = _resolve_address(address)
+        self.timeout = timeout
+        self.fallback = fallback
+        self._sock = None
+        self._reader = None
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._sock is None:
+            sock = socket.socket(self.family, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.address)
+            except OSError:
+                sock.close()
+                raise
+            self._sock, self._reader = sock, sock.makefile('rb')
+        return self._sock
+
+    def _exchange(self, messages):
+        # Sends all messages, then reads until every one has its reply.
+        with self._lock:
+            try:
+                sock = self._connect()
+                ids = []
+                for message in messages:
+                    self._next_id += 1
+                    ids.append(self._next_id)
+                    message['id'] = self._next_id
+                sock.sendall(b''.join((json.dumps(m) + '\n').encode('utf-8') for m in messages))
+                replies = {}
+                while len(replies) < len(ids):
+                    line = self._reader.readline()
+                    if not line:
+                        raise ConnectionError("solver server closed the connection")
+                    reply = json.loads(line)
+                    replies[reply.get('id')] = reply
+                return [replies[i] for i in ids]
+            except (OSError, ValueError):
+                self.close()
+                raise
+
+    def ping(self):
+        return self._exchange([{'op': 'ping'}])[0].get('ok', False)
+
+    def metrics(self):
+        return self._exchange([{'op': 'metrics'}])[0]['metrics']
+
+    def solve_facelets(self, facelets, optimal=False):
+        if optimal:
+            return super().solve_facelets(facelets, optimal=True)
+        try:
+            reply = self._exchange([{'op': 'solve', 'facelets': facelets}])[0]
+        except (OSError, ValueError) as e:
+            if self.fallback:
+                return super().solve_facelets(facelets)
+            raise RuntimeError(f"Solver failed: {e}")
+        if 'error' in reply:
+            raise RuntimeError(reply['error'])
+        return reply['solution']
+
+    def solve_many(self, items, chunk_size=64):
+        # Like solver.solve_many, pipelining chunk_size requests per round trip.
+        # Results come back in input order.
+        pending, failed = [], []
+        for index, item in enumerate(items):
+            try:
+                pending.append((index, to_facelets(item, self)))
+            except Exception as e:
+                failed.append(SolveResult(index, None, None, f"Solver failed: {e}", 0.0))
+            if len(pending) + len(failed) >= chunk_size:
+                yield from sorted(failed + self._solve_pending(pending), key=attrgetter('index'))
+                pending, failed = [], []
+        if pending or failed:
+            yield from sorted(failed + self._solve_pending(pending), key=attrgetter('index'))
+
+    def _solve_pending(self, pending):
+        if not pending:
+            return []
+        began = time.perf_counter()
+        try:
+            replies = self._exchange([{'op': 'solve', 'facelets': f} for _, f in pending])
+        except (OSError, ValueError) as e:
+            if not self.fallback:
+                raise RuntimeError(f"Solver failed: {e}")
+            return solve_chunk(pending)
+        elapsed = (time.perf_counter() - began) / len(pending)
+        return [SolveResult(index, facelets, reply.get('solution'), reply.get('error'), reply.get('seconds', elapsed))
+                for (index, facelets), reply in zip(pending, replies)]
+
+    def close(self):
+        if self._sock is not None:
+            try:
+                self._reader.close()
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = self._reader = None
+
+
+def connect_solver(address=None, timeout=60.0, cache=None):
+    # A SolverClient if a server answers at `address`, otherwise a local
+    # KociembaSolver using `cache`. Callers use either through the same API.
+    client = SolverClient(address, timeout=timeout)
+    try:
+        if client.ping():
+            return client
+    except (OSError, ValueError):
+        pass
+    client.close()
+    return KociembaSolver(cache=cache)
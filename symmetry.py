@@ -0,0 +1,86 @@
+from itertools import permutations, product
+from operator import itemgetter
+
+
+_FACE_NORMALS = {
+    'U': (0, 1, 0), 'R': (1, 0, 0), 'F': (0, 0, 1),
+    'D': (0, -1, 0), 'L': (-1, 0, 0), 'B': (0, 0, -1)
+}
+_NORMAL_FACES = {n: f for f, n in _FACE_NORMALS.items()}
+
+
+def _facelet_location(face, r, c):
+    # Cubelet position on the {-1, 0, 1} grid, matching the renderer's layout.
+    if face == 'U': pos = (c - 1, 1, r - 1)
+    elif face == 'D': pos = (c - 1, -1, 1 - r)
+    elif face == 'F': pos = (c - 1, 1 - r, 1)
+    elif face == 'B': pos = (1 - c, 1 - r, -1)
+    elif face == 'L': pos = (-1, 1 - r, c - 1)
+    else: pos = (1, 1 - r, 1 - c)
+    normal = _FACE_NORMALS[face]
+    return tuple(2 * p + n for p, n in zip(pos, normal))
+
+
+_LOCATIONS = [_facelet_location(f, r, c) for f in 'URFDLB' for r in range(3) for c in range(3)]
+_LOCATION_INDEX = {loc: i for i, loc in enumerate(_LOCATIONS)}
+
+
+def _transform(matrix, vec):
+    return tuple(sum(matrix[i][j] * vec[j] for j in range(3)) for i in range(3))
+
+
+def _determinant(m):
+    return (m[0][0] * (m[1][1] * m[2][2] - m[1][2] * m[2][1])
+            - m[0][1] * (m[1][0] * m[2][2] - m[1][2] * m[2][0])
+            + m[0][2] * (m[1][0] * m[2][1] - m[1][1] * m[2][0]))
+
+
+class Symmetry:
+    __slots__ = ('index', 'matrix', 'is_reflection', 'face_map', '_gather', '_relabel', '_face_back')
+
+    def __init__(self, index, matrix):
+        self.index = index
+        self.matrix = matrix
+        self.is_reflection = _determinant(matrix) < 0
+        self.face_map = {f: _NORMAL_FACES[_transform(matrix, n)] for f, n in _FACE_NORMALS.items()}
+        self._face_back = {v: k for k, v in self.face_map.items()}
+        source = [0] * 54
+        for i, loc in enumerate(_LOCATIONS):
+            source[_LOCATION_INDEX[_transform(matrix, loc)]] = i
+        self._gather = itemgetter(*source)
+        self._relabel = str.maketrans(self.face_map)
+
+    def apply(self, facelets):
+        return ''.join(self._gather(facelets)).translate(self._relabel)
+
+    def map_solution_back(self, moves):
+        # Moves that solve apply(facelets) turned into moves that solve facelets.
+        mapped = []
+        for m in moves:
+            face, suffix = self._face_back[m[0]], m[1:]
+            if self.is_reflection:
+                suffix = {'': "'", "'": ''}.get(suffix, suffix)
+            mapped.append(face + suffix)
+        return mapped
+
+
+def _build_symmetries():
+    matrices = []
+    for axes in permutations(range(3)):
+        for signs in product((1, -1), repeat=3):
+            matrices.append(tuple(
+                tuple(signs[i] if j == axes[i] else 0 for j in range(3)) for i in range(3)
+            ))
+    return [Symmetry(i, m) for i, m in enumerate(matrices)]
+
+
+SYMMETRIES = _build_symmetries()
+
+
+def canonicalize(facelets):
+    best, best_sym = None, None
+    for sym in SYMMETRIES:
+        candidate = sym.apply(facelets)
+        if best is None or candidate < best:
+            best, best_sym = candidate, sym
+    return best, best_sym
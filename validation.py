@@ -0,0 +1,178 @@
+from collections import namedtuple
+from functools import lru_cache
+from cube import CORNER_FACELETS, CORNER_LOOKUP, CORNER_NAMES, EDGE_FACELETS, EDGE_LOOKUP, EDGE_NAMES
+
+
+OK = 'ok'
+WRONG_LENGTH = 'wrong_length'
+BAD_CENTERS = 'bad_centers'
+BAD_COLOR_COUNT = 'bad_color_count'
+INVALID_CORNER = 'invalid_corner'
+INVALID_EDGE = 'invalid_edge'
+DUPLICATE_CORNER = 'duplicate_corner'
+DUPLICATE_EDGE = 'duplicate_edge'
+TWISTED_CORNER = 'twisted_corner'
+FLIPPED_EDGE = 'flipped_edge'
+PARITY = 'parity'
+
+# Batch results are indices into this tuple; checks run in this order.
+REASONS = (OK, WRONG_LENGTH, BAD_CENTERS, BAD_COLOR_COUNT, INVALID_CORNER, INVALID_EDGE,
+           DUPLICATE_CORNER, DUPLICATE_EDGE, TWISTED_CORNER, FLIPPED_EDGE, PARITY)
+
+
+class ValidationResult(namedtuple('ValidationResult', ['reason', 'message'])):
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        return self.reason == OK
+
+
+_VALID = ValidationResult(OK, '')
+
+
+def _cycle_parity(perm):
+    # Parity from the cycle decomposition; perm must be a permutation.
+    seen = [False] * len(perm)
+    parity = 0
+    for start in range(len(perm)):
+        if seen[start]:
+            continue
+        i, length = start, 0
+        while not seen[i]:
+            seen[i] = True
+            i = perm[i]
+            length += 1
+        parity ^= (length - 1) & 1
+    return parity
+
+
+def validate_facelets(facelets):
+    if len(facelets) != 54:
+        return ValidationResult(WRONG_LENGTH, f"Facelet string wrong length: {len(facelets)} (expected 54).")
+    if facelets[4::9] != 'URFDLB':
+        return ValidationResult(BAD_CENTERS, f"Centers must be URFDLB, got {facelets[4::9]}.")
+    for face in 'URFDLB':
+        if facelets.count(face) != 9:
+            counts = {f: facelets.count(f) for f in sorted(set(facelets))}
+            return ValidationResult(BAD_COLOR_COUNT, f"Facelet counts incorrect: {counts}")
+
+    cp, twist = [], 0
+    for i, (a, b, c) in enumerate(CORNER_FACELETS):
+        found = CORNER_LOOKUP.get(facelets[a] + facelets[b] + facelets[c])
+        if found is None:
+            return ValidationResult(INVALID_CORNER, f"Corner {CORNER_NAMES[i]} has invalid colors "
+                                                    f"{facelets[a] + facelets[b] + facelets[c]}.")
+        cp.append(found[0])
+        twist += found[1]
+    ep, flip = [], 0
+    for i, (a, b) in enumerate(EDGE_FACELETS):
+        found = EDGE_LOOKUP.get(facelets[a] + facelets[b])
+        if found is None:
+            return ValidationResult(INVALID_EDGE, f"Edge {EDGE_NAMES[i]} has invalid colors "
+                                                  f"{facelets[a] + facelets[b]}.")
+        ep.append(found[0])
+        flip += found[1]
+
+    if len(set(cp)) != 8:
+        missing = [CORNER_NAMES[j] for j in range(8) if j not in cp]
+        return ValidationResult(DUPLICATE_CORNER, f"Some corners appear twice; missing {', '.join(missing)}.")
+    if len(set(ep)) != 12:
+        missing = [EDGE_NAMES[j] for j in range(12) if j not in ep]
+        return ValidationResult(DUPLICATE_EDGE, f"Some edges appear twice; missing {', '.join(missing)}.")
+    if twist % 3:
+        return ValidationResult(TWISTED_CORNER, "A corner is twisted (corner orientations do not sum to 0 mod 3).")
+    if flip % 2:
+        return ValidationResult(FLIPPED_EDGE, "An edge is flipped (edge orientations do not sum to 0 mod 2).")
+    if _cycle_parity(cp) != _cycle_parity(ep):
+        return ValidationResult(PARITY, "Two pieces are swapped (corner and edge permutation parities differ).")
+    return _VALID
+
+
+def check_facelets(facelets):
+    result = validate_facelets(facelets)
+    if not result.ok:
+        raise ValueError(result.message)
+    return True
+
+
+@lru_cache(maxsize=None)
+def _batch_tables():
+    import numpy as np
+    # Face letter -> 0..5, anything else -> 6.
+    face_ids = np.full(256, 6, dtype=np.intp)
+    for i, face in enumerate(b'URFDLB'):
+        face_ids[face] = i
+    # Cubie/orientation lookups keyed by the face ids of a slot's stickers in
+    # base 7; -1 marks impossible color combinations.
+    corner_table = np.full((7 ** 3, 2), -1, dtype=np.intp)
+    for key, found in CORNER_LOOKUP.items():
+        a, b, c = (face_ids[ord(ch)] for ch in key)
+        corner_table[(a * 7 + b) * 7 + c] = found
+    edge_table = np.full((7 ** 2, 2), -1, dtype=np.intp)
+    for key, found in EDGE_LOOKUP.items():
+        a, b = (face_ids[ord(ch)] for ch in key)
+        edge_table[a * 7 + b] = found
+    return face_ids, corner_table, edge_table, np.array(CORNER_FACELETS), np.array(EDGE_FACELETS)
+
+
+def _identify_cubies(np, facelets):
+    # Face ids of every sticker plus (cubie, orientation) per corner and edge slot.
+    face_ids, corner_table, edge_table, corner_slots, edge_slots = _batch_tables()
+    ids = face_ids[facelets]
+    corner_ids = ids[:, corner_slots]
+    corners = corner_table[(corner_ids[:, :, 0] * 7 + corner_ids[:, :, 1]) * 7 + corner_ids[:, :, 2]]
+    edge_ids = ids[:, edge_slots]
+    edges = edge_table[edge_ids[:, :, 0] * 7 + edge_ids[:, :, 1]]
+    return ids, corners, edges
+
+
+def facelet_array_to_cubies(facelets):
+    # Vectorized CubieCube.from_facelets for an (N, 54) array of valid states:
+    # returns (cp, co, ep, eo) arrays.
+    import numpy as np
+    _, corners, edges = _identify_cubies(np, facelets)
+    return corners[:, :, 0], corners[:, :, 1], edges[:, :, 0], edges[:, :, 1]
+
+
+def validate_facelet_array(facelets):
+    # Vectorized validate_facelets over an (N, 54) array of URFDLB letters (or
+    # a list of strings). Returns an array of indices into REASONS, reporting
+    # the first failed check of every cube.
+    import numpy as np
+    from scrambler import permutation_parity
+    if not isinstance(facelets, np.ndarray):
+        facelets = list(facelets)
+        if any(len(f) != 54 for f in facelets):
+            reasons = np.zeros(len(facelets), dtype=np.uint8)
+            lengths = np.array([len(f) for f in facelets])
+            good = lengths == 54
+            reasons[~good] = REASONS.index(WRONG_LENGTH)
+            if good.any():
+                reasons[good] = validate_facelet_array([f for f in facelets if len(f) == 54])
+            return reasons
+        facelets = np.frombuffer(''.join(facelets).encode('ascii'), dtype=np.uint8).reshape(-1, 54)
+    if facelets.ndim != 2 or facelets.shape[1] != 54:
+        raise ValueError(f"Expected an (N, 54) facelet array, got shape {facelets.shape}.")
+
+    ids, corners, edges = _identify_cubies(np, facelets)
+    count = ids.shape[0]
+    reasons = np.zeros(count, dtype=np.uint8)
+
+    def fail(mask, reason):
+        reasons[(reasons == 0) & mask] = REASONS.index(reason)
+
+    fail((ids[:, 4::9] != np.arange(6)).any(axis=1), BAD_CENTERS)
+    counts = (ids[:, :, None] == np.arange(6)).sum(axis=1)
+    fail((counts != 9).any(axis=1), BAD_COLOR_COUNT)
+
+    fail((corners[:, :, 0] < 0).any(axis=1), INVALID_CORNER)
+    fail((edges[:, :, 0] < 0).any(axis=1), INVALID_EDGE)
+
+    cp, ep = corners[:, :, 0], edges[:, :, 0]
+    fail(((cp[:, :, None] == np.arange(8)).sum(axis=1) != 1).any(axis=1), DUPLICATE_CORNER)
+    fail(((ep[:, :, None] == np.arange(12)).sum(axis=1) != 1).any(axis=1), DUPLICATE_EDGE)
+    fail(corners[:, :, 1].sum(axis=1) % 3 != 0, TWISTED_CORNER)
+    fail(edges[:, :, 1].sum(axis=1) % 2 != 0, FLIPPED_EDGE)
+    fail(permutation_parity(cp) != permutation_parity(ep), PARITY)
+    return reasons